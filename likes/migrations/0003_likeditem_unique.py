@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_likes(apps, schema_editor):
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    duplicates = LikedItem.objects \
+        .values('user_id', 'content_type_id', 'object_id') \
+        .annotate(keep=Min('pk'), count=models.Count('pk')) \
+        .filter(count__gt=1)
+    for duplicate in duplicates:
+        LikedItem.objects \
+            .filter(user_id=duplicate['user_id'], content_type_id=duplicate['content_type_id'],
+                    object_id=duplicate['object_id']) \
+            .exclude(pk=duplicate['keep']) \
+            .delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0002_likeditem_content_object_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='likes_likeditem_unique'),
+        ),
+    ]
@@ -9,3 +9,13 @@ class LikedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id']),
+        ]
+        constraints = [
+            # One like per user and object; also answers which of a page of
+            # objects a user has liked.
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='likes_likeditem_unique'),
+        ]
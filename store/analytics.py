@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import CollectionDailySales, Order, OrderItem, ProductDailySales, RollupWatermark
+
+
+WATERMARK = 'sales'
+
+# Adds a chunk's totals to the day's row, creating the row on its first order.
+ADD_SALES = """
+    INSERT INTO {table} (day, {key}, units, revenue, order_count)
+    VALUES {rows}
+    ON CONFLICT (day, {key}) DO UPDATE SET
+        units = {table}.units + EXCLUDED.units,
+        revenue = {table}.revenue + EXCLUDED.revenue,
+        order_count = {table}.order_count + EXCLUDED.order_count
+"""
+
+
+def add_sales(model, key, rows):
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    sql = ADD_SALES.format(table=quote(model._meta.db_table), key=quote(key),
+                           rows=', '.join(['(%s, %s, %s, %s, %s)'] * len(rows)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def sales_by(order_ids, key):
+    return OrderItem.objects \
+        .filter(order_id__in=order_ids) \
+        .order_by() \
+        .values_list(TruncDate('order__placed_at'), key) \
+        .annotate(units=Sum('quantity'),
+                  revenue=Sum(F('quantity') * F('unit_price')),
+                  order_count=Count('order_id', distinct=True))
+
+
+def rollup_cutoff():
+    # Orders younger than the lag may still be committing out of id order.
+    return timezone.now() - timedelta(seconds=settings.STORE_SALES_ROLLUP_LAG)
+
+
+def roll_up_chunk(chunk_size, until):
+    """
+    Adds the next `chunk_size` orders placed before `until` to the daily
+    rollups and moves the watermark past them, in one transaction. Every
+    order lands in exactly one chunk, so order counts can be summed.
+    Returns the number of orders counted.
+    """
+    with transaction.atomic():
+        # Locked so that overlapping runs cannot count the same orders.
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        orders = Order.objects.filter(placed_at__lt=until)
+        if watermark.placed_at is not None:
+            orders = orders.filter(Q(placed_at__gt=watermark.placed_at) |
+                                   Q(placed_at=watermark.placed_at, pk__gt=watermark.order_id))
+        orders = list(orders.order_by('placed_at', 'pk').values_list('pk', 'placed_at')[:chunk_size])
+        if not orders:
+            return 0
+
+        order_ids = [order_id for order_id, _ in orders]
+        add_sales(ProductDailySales, 'product_id', list(sales_by(order_ids, 'product_id')))
+        add_sales(CollectionDailySales, 'collection_id', list(sales_by(order_ids, 'product__collection_id')))
+        watermark.order_id, watermark.placed_at = orders[-1]
+        watermark.save()
+    return len(orders)
+
+
+def roll_up_sales(chunk_size=None, max_chunks=None, until=None):
+    """
+    Counts orders placed since the watermark, chunk by chunk. Orders younger
+    than STORE_SALES_ROLLUP_LAG are left for the next run, so a checkout
+    that commits late is not skipped. Returns the number of orders counted.
+    """
+    chunk_size = chunk_size or settings.STORE_SALES_ROLLUP_CHUNK_SIZE
+    until = until or rollup_cutoff()
+    counted = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        count = roll_up_chunk(chunk_size, until)
+        counted += count
+        chunks += 1
+        if count < chunk_size:
+            break
+    return counted
+
+
+def reset_sales():
+    with transaction.atomic():
+        ProductDailySales.objects.all().delete()
+        CollectionDailySales.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK).delete()
+
+
+class SalesFilterSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    collection = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, data):
+        # The last seven days unless a range is given.
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', data['end'] - timedelta(days=6))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        return data
+
+
+def collection_sales(start, end, collection=None, **kwargs):
+    queryset = CollectionDailySales.objects.filter(day__range=(start, end))
+    if collection is not None:
+        queryset = queryset.filter(collection_id=collection)
+    return list(queryset
+                .order_by('day', 'collection_id')
+                .values('day', 'collection_id', 'units', 'revenue', 'order_count',
+                        collection_title=F('collection__title')))
+
+
+def top_products(start, end, collection=None, limit=10, **kwargs):
+    queryset = ProductDailySales.objects.filter(day__range=(start, end))
+    if collection is not None:
+        queryset = queryset.filter(product__collection_id=collection)
+    return list(queryset
+                .values('product_id', product_title=F('product__title'))
+                .annotate(units=Sum('units'), revenue=Sum('revenue'), order_count=Sum('order_count'))
+                .order_by('-revenue', 'product_id')[:limit])
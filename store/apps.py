@@ -6,5 +6,5 @@ class StoreConfig(AppConfig):
     name = 'store'
     
     def ready(self) -> None:
-        import store.signals
+        import store.signals.handlers
         
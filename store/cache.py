@@ -0,0 +1,147 @@
+import hashlib
+import time
+from functools import partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+KEY_PREFIX = 'store'
+
+
+def version_key(scope):
+    return ':'.join([KEY_PREFIX, 'version', *map(str, scope)])
+
+
+def get_versions(scopes):
+    """
+    Returns the current version stamp of every scope, e.g. ('product', 1)
+    or ('catalog',). Stamps are nanosecond timestamps, so a stamp that was
+    evicted comes back newer than anything cached under the old one.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump(*scopes):
+    now = time.time_ns()
+    cache.set_many({version_key(scope): now for scope in scopes}, timeout=None)
+
+
+def bump_on_commit(*scopes):
+    """
+    Bumps `scopes` once the current transaction commits, or right away
+    outside one. Bumped earlier, a reader could cache the old committed
+    rows under the new stamp before the write becomes visible.
+    """
+    transaction.on_commit(partial(bump, *scopes))
+
+
+def product_scopes(product_id, collection_ids):
+    return [('product', product_id), ('catalog',)] + \
+        [('collection', collection_id) for collection_id in collection_ids if collection_id is not None]
+
+
+def normalize_query(request):
+    params = sorted((key, value)
+                    for key in request.query_params
+                    for value in request.query_params.getlist(key))
+    return urlencode(params)
+
+
+def make_digest(request, versions):
+    raw = '|'.join([request.scheme, request.get_host(), request.path,
+                    normalize_query(request), *map(str, versions)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_response(request, name, scopes, render, last_update=None):
+    """
+    Serves `render()` from the cache. The key covers the normalized query
+    string and the version stamps of `scopes`, so bumping any of them makes
+    the next request miss.
+
+    The same digest is sent as a strong ETag, and the newest stamp (or
+    `last_update`, if later) as Last-Modified, so If-None-Match and
+    If-Modified-Since are answered with a 304 before anything is rendered.
+    """
+    versions = get_versions(scopes)
+    modified_at = max(versions) / 1e9
+    if last_update is not None:
+        versions.append(last_update.isoformat())
+        modified_at = max(modified_at, last_update.timestamp())
+    digest = make_digest(request, versions)
+    etag = quote_etag(digest)
+    last_modified = int(modified_at)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        key = ':'.join([KEY_PREFIX, name, digest])
+        data = cache.get(key)
+        if data is not None:
+            record(name, hit=True)
+            response = Response(data)
+        else:
+            record(name, hit=False)
+            response = render()
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, timeout=settings.STORE_CACHE_TIMEOUT)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_value(name, scopes, params, compute):
+    """
+    Returns `compute()` from the cache, keyed by the `params` dict and the
+    version stamps of `scopes`, for values shared by several responses.
+    """
+    versions = get_versions(scopes)
+    raw = '|'.join([urlencode(sorted(params.items()), doseq=True), *map(str, versions)])
+    key = ':'.join([KEY_PREFIX, name, hashlib.sha1(raw.encode()).hexdigest()])
+    value = cache.get(key)
+    record(name, hit=value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout=settings.STORE_CACHE_TIMEOUT)
+    return value
+
+
+def stats_key(name, outcome):
+    return ':'.join([KEY_PREFIX, 'stats', name, outcome])
+
+
+def record(name, hit):
+    key = stats_key(name, 'hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats(names):
+    stats = {}
+    for name in names:
+        hits = cache.get(stats_key(name, 'hits'), 0)
+        misses = cache.get(stats_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+    return stats
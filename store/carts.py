@@ -0,0 +1,599 @@
+import threading
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+from django.utils.module_loading import import_string
+
+from . import cache
+from .models import Cart, CartItem, Product
+
+
+CART_KEY_PREFIX = 'store:cart:'
+DIRTY_CARTS_KEY = 'store:carts:dirty'
+# Always present in a cart hash, so an empty cart still has a key.
+MARKER = 'cart'
+
+ADD = 'add'
+SET = 'set'
+REMOVE = 'remove'
+
+
+class CartContents:
+    """
+    What CartSerializer renders: the cart id, its items and, if the store
+    computed it, the grand total.
+    """
+
+    def __init__(self, id, items, total_price=None):
+        self.id = id
+        self.items = items
+        self.total_price = total_price
+
+
+def parse_cart_id(cart_id):
+    try:
+        return str(UUID(str(cart_id)))
+    except ValueError:
+        raise Cart.DoesNotExist
+
+
+def parse_item_id(item_id):
+    try:
+        return int(item_id)
+    except (TypeError, ValueError):
+        raise CartItem.DoesNotExist
+
+
+def cart_scopes(cart_id):
+    """Cache scopes of a cart snapshot: the cart and the product data it shows."""
+    return [('cart', parse_cart_id(cart_id)), ('catalog',), ('products',)]
+
+
+def cart_changed(cart_id):
+    cache.bump(('cart', parse_cart_id(cart_id)))
+
+
+def fold_changes(changes):
+    """
+    Reduces (op, product_id, quantity) changes, applied in order, to one
+    {product_id: (op, quantity)} change per product.
+    """
+    folded = {}
+    for op, product_id, quantity in changes:
+        previous_op, previous_quantity = folded.get(product_id, (None, 0))
+        if op == ADD and previous_op in (ADD, SET):
+            folded[product_id] = (previous_op, previous_quantity + quantity)
+        elif op == ADD and previous_op == REMOVE:
+            folded[product_id] = (SET, quantity)
+        else:
+            folded[product_id] = (op, quantity)
+    return folded
+
+
+def load_products(product_ids):
+    return Product.objects.only('id', 'title', 'unit_price').in_bulk(product_ids)
+
+
+class CartStore:
+    """
+    Where carts live while they are being filled. Missing carts raise
+    Cart.DoesNotExist, missing items CartItem.DoesNotExist and adding an
+    unknown product Product.DoesNotExist.
+    """
+
+    def create(self):
+        raise NotImplementedError
+
+    def get_cart(self, cart_id):
+        raise NotImplementedError
+
+    def get_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    def add_item(self, cart_id, product_id, quantity):
+        raise NotImplementedError
+
+    def update_item(self, cart_id, item_id, quantity):
+        raise NotImplementedError
+
+    def remove_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    def apply_changes(self, cart_id, changes):
+        """
+        Applies (op, product_id, quantity) changes, where op is ADD, SET or
+        REMOVE, all at once and returns the resulting cart. Products must
+        have been checked by the caller.
+        """
+        raise NotImplementedError
+
+    def delete(self, cart_id):
+        raise NotImplementedError
+
+    def flush(self, cart_id):
+        """Makes the Cart and CartItem rows match the stored cart."""
+
+    def flush_dirty(self, batch_size):
+        """Flushes up to `batch_size` carts changed since their last flush."""
+        return 0
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Keeps carts in the Cart and CartItem tables. Every mutation is a single
+    statement; the cart is only looked up separately to explain a miss.
+    """
+
+    # Selecting from the cart and product tables makes a missing cart or
+    # product insert nothing instead of failing a foreign key check, which
+    # PostgreSQL would only report at commit.
+    UPSERT_ITEM = """
+        INSERT INTO {item} (cart_id, product_id, quantity)
+        SELECT {cart}.id, {product}.id, %s FROM {cart}, {product}
+        WHERE {cart}.id = %s AND {product}.id = %s
+        ON CONFLICT (cart_id, product_id)
+        DO UPDATE SET quantity = {item}.quantity + excluded.quantity
+        RETURNING id, quantity
+    """
+    ADD_ITEMS = """
+        INSERT INTO {item} (cart_id, product_id, quantity) VALUES {values}
+        ON CONFLICT (cart_id, product_id)
+        DO UPDATE SET quantity = {item}.quantity + excluded.quantity
+    """
+
+    def create(self):
+        return CartContents(Cart.objects.create().id, [])
+
+    def get_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        items = list(self.items(cart_id))
+        if not items:
+            self.check_cart(cart_id)
+            return CartContents(UUID(cart_id), [], 0)
+        return CartContents(UUID(cart_id), items, items[0].cart_total)
+
+    def get_item(self, cart_id, item_id):
+        cart_id = parse_cart_id(cart_id)
+        try:
+            return self.items(cart_id).get(pk=parse_item_id(item_id))
+        except CartItem.DoesNotExist:
+            self.check_cart(cart_id)
+            raise
+
+    def add_item(self, cart_id, product_id, quantity):
+        cart_id = parse_cart_id(cart_id)
+        with connection.cursor() as cursor:
+            cursor.execute(self.sql(self.UPSERT_ITEM), [quantity, self.cart_pk(cart_id), product_id])
+            row = cursor.fetchone()
+        if row is None:
+            self.check_cart(cart_id)
+            raise Product.DoesNotExist
+        item_id, quantity = row
+        return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+    def update_item(self, cart_id, item_id, quantity):
+        cart_id = parse_cart_id(cart_id)
+        item_id = parse_item_id(item_id)
+        if not CartItem.objects.filter(cart_id=cart_id, pk=item_id).update(quantity=quantity):
+            self.check_cart(cart_id)
+            raise CartItem.DoesNotExist
+        return CartItem(id=item_id, cart_id=cart_id, quantity=quantity)
+
+    def remove_item(self, cart_id, item_id):
+        cart_id = parse_cart_id(cart_id)
+        deleted, _ = CartItem.objects.filter(cart_id=cart_id, pk=parse_item_id(item_id)).delete()
+        if not deleted:
+            self.check_cart(cart_id)
+            raise CartItem.DoesNotExist
+
+    def apply_changes(self, cart_id, changes):
+        cart_id = parse_cart_id(cart_id)
+        by_op = {ADD: [], SET: [], REMOVE: []}
+        for product_id, (op, quantity) in fold_changes(changes).items():
+            by_op[op].append((product_id, quantity))
+        with transaction.atomic():
+            # Locking the cart keeps a concurrent checkout from deleting it
+            # between the check and the writes.
+            if not list(Cart.objects.select_for_update().filter(pk=cart_id).values_list('pk', flat=True)):
+                raise Cart.DoesNotExist
+            if by_op[REMOVE]:
+                removed = [product_id for product_id, _ in by_op[REMOVE]]
+                CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+            if by_op[SET]:
+                CartItem.objects.bulk_create(
+                    [CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                     for product_id, quantity in by_op[SET]],
+                    update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'])
+            if by_op[ADD]:
+                cart_pk = self.cart_pk(cart_id)
+                values = ', '.join(['(%s, %s, %s)'] * len(by_op[ADD]))
+                params = [value for product_id, quantity in by_op[ADD] for value in (cart_pk, product_id, quantity)]
+                with connection.cursor() as cursor:
+                    cursor.execute(self.sql(self.ADD_ITEMS, values=values), params)
+        return self.get_cart(cart_id)
+
+    def delete(self, cart_id):
+        deleted, _ = Cart.objects.filter(pk=parse_cart_id(cart_id)).delete()
+        if not deleted:
+            raise Cart.DoesNotExist
+
+    def sql(self, template, **kwargs):
+        quote = connection.ops.quote_name
+        return template.format(item=quote(CartItem._meta.db_table), cart=quote(Cart._meta.db_table),
+                               product=quote(Product._meta.db_table), **kwargs)
+
+    def cart_pk(self, cart_id):
+        return Cart._meta.pk.get_db_prep_value(UUID(cart_id), connection)
+
+    def check_cart(self, cart_id):
+        if not Cart.objects.filter(pk=cart_id).exists():
+            raise Cart.DoesNotExist
+
+    def items(self, cart_id):
+        # Line and grand totals come from the database, and only the product
+        # columns SimpleProductSerializer shows are read.
+        line_total = ExpressionWrapper(F('quantity') * F('product__unit_price'),
+                                       output_field=DecimalField(max_digits=12, decimal_places=2))
+        return CartItem.objects \
+            .select_related('product') \
+            .only('cart', 'product', 'quantity', 'product__title', 'product__unit_price') \
+            .filter(cart_id=cart_id) \
+            .annotate(total_price=line_total, cart_total=Window(Sum(line_total))) \
+            .order_by('pk')
+
+
+class WriteBehindCartStore(CartStore):
+    """
+    Keeps each cart as a {product_id: quantity} mapping outside the database
+    and writes it to Cart/CartItem only when flushed: at checkout, or for
+    carts marked dirty, by the `flush_carts` task. A cart that is not in the
+    store is read back from the database, so flushed carts survive expiry.
+
+    Items are identified by their product id, which is unique in a cart.
+
+    Subclasses provide the storage primitives below. Each mutation must be
+    atomic and mark the cart dirty.
+    """
+
+    def read(self, cart_id):
+        """Returns the cart's {product_id: quantity}, or None if it is not stored."""
+        raise NotImplementedError
+
+    def write(self, cart_id, items):
+        """Stores a cart with the given items, without marking it dirty."""
+        raise NotImplementedError
+
+    def increment(self, cart_id, product_id, quantity):
+        """Returns the new quantity, or None if the cart is not stored."""
+        raise NotImplementedError
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        """Returns None if the cart is not stored and False if the item is missing."""
+        raise NotImplementedError
+
+    def remove(self, cart_id, product_id):
+        """Returns None if the cart is not stored and False if the item is missing."""
+        raise NotImplementedError
+
+    def apply(self, cart_id, folded):
+        """Applies fold_changes() output at once; returns None if the cart is not stored."""
+        raise NotImplementedError
+
+    def discard(self, cart_id):
+        """Forgets the cart, including its dirty mark."""
+        raise NotImplementedError
+
+    def mark_dirty(self, cart_ids):
+        raise NotImplementedError
+
+    def pop_dirty(self, count):
+        raise NotImplementedError
+
+    def create(self):
+        cart_id = str(uuid4())
+        self.write(cart_id, {})
+        return CartContents(UUID(cart_id), [])
+
+    def get_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        items = self.read(cart_id)
+        if items is None:
+            items = self.restore(cart_id)
+        products = load_products(items)
+        return CartContents(UUID(cart_id), [
+            CartItem(id=product_id, cart_id=cart_id, product=products[product_id], quantity=quantity)
+            for product_id, quantity in sorted(items.items()) if product_id in products
+        ])
+
+    def get_item(self, cart_id, item_id):
+        product_id = parse_item_id(item_id)
+        for item in self.get_cart(cart_id).items:
+            if item.product_id == product_id:
+                return item
+        raise CartItem.DoesNotExist
+
+    def add_item(self, cart_id, product_id, quantity):
+        cart_id = parse_cart_id(cart_id)
+        if not Product.objects.filter(pk=product_id).exists():
+            raise Product.DoesNotExist
+        new_quantity = self.increment(cart_id, product_id, quantity)
+        if new_quantity is None:
+            self.restore(cart_id)
+            new_quantity = self.increment(cart_id, product_id, quantity)
+        return CartItem(id=product_id, cart_id=cart_id, product_id=product_id, quantity=new_quantity)
+
+    def update_item(self, cart_id, item_id, quantity):
+        cart_id = parse_cart_id(cart_id)
+        product_id = parse_item_id(item_id)
+        found = self.set_quantity(cart_id, product_id, quantity)
+        if found is None:
+            self.restore(cart_id)
+            found = self.set_quantity(cart_id, product_id, quantity)
+        if not found:
+            raise CartItem.DoesNotExist
+        return CartItem(id=product_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+    def remove_item(self, cart_id, item_id):
+        cart_id = parse_cart_id(cart_id)
+        product_id = parse_item_id(item_id)
+        found = self.remove(cart_id, product_id)
+        if found is None:
+            self.restore(cart_id)
+            found = self.remove(cart_id, product_id)
+        if not found:
+            raise CartItem.DoesNotExist
+
+    def apply_changes(self, cart_id, changes):
+        cart_id = parse_cart_id(cart_id)
+        folded = fold_changes(changes)
+        if self.apply(cart_id, folded) is None:
+            self.restore(cart_id)
+            self.apply(cart_id, folded)
+        return self.get_cart(cart_id)
+
+    def delete(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        stored = self.read(cart_id) is not None
+        self.discard(cart_id)
+        deleted, _ = Cart.objects.filter(pk=cart_id).delete()
+        if not stored and not deleted:
+            raise Cart.DoesNotExist
+
+    def restore(self, cart_id):
+        # One LEFT JOIN tells an empty cart ([(None, None)]) from a missing one ([]).
+        rows = Cart.objects.filter(pk=cart_id).values_list('items__product_id', 'items__quantity')
+        if not rows:
+            raise Cart.DoesNotExist
+        items = {product_id: quantity for product_id, quantity in rows if product_id is not None}
+        self.write(cart_id, items)
+        return items
+
+    def flush(self, cart_id):
+        self.flush_many([parse_cart_id(cart_id)])
+
+    def flush_dirty(self, batch_size):
+        cart_ids = self.pop_dirty(batch_size)
+        if cart_ids:
+            try:
+                self.flush_many(cart_ids)
+            except Exception:
+                self.mark_dirty(cart_ids)
+                raise
+        return len(cart_ids)
+
+    def flush_many(self, cart_ids):
+        carts = {}
+        for cart_id in cart_ids:
+            items = self.read(cart_id)
+            if items is not None:
+                carts[cart_id] = items
+        if not carts:
+            return
+        product_ids = {product_id for items in carts.values() for product_id in items}
+        existing = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        with transaction.atomic():
+            Cart.objects.bulk_create([Cart(id=cart_id) for cart_id in carts], ignore_conflicts=True)
+            CartItem.objects.filter(cart_id__in=carts).delete()
+            CartItem.objects.bulk_create([
+                CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                for cart_id, items in carts.items()
+                for product_id, quantity in items.items() if product_id in existing
+            ])
+
+
+class RedisCartStore(WriteBehindCartStore):
+    """
+    Keeps each cart as a Redis hash of product id to quantity that expires
+    STORE_CART_TTL seconds after its last use. Conditional mutations run as
+    Lua scripts so they cannot resurrect a cart that just expired.
+    """
+
+    INCREMENT = """
+        if redis.call('exists', KEYS[1]) == 0 then return nil end
+        local quantity = redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+        redis.call('expire', KEYS[1], ARGV[3])
+        redis.call('sadd', KEYS[2], ARGV[4])
+        return quantity
+    """
+    SET_QUANTITY = """
+        if redis.call('exists', KEYS[1]) == 0 then return nil end
+        if redis.call('hexists', KEYS[1], ARGV[1]) == 0 then return 0 end
+        redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+        redis.call('expire', KEYS[1], ARGV[3])
+        redis.call('sadd', KEYS[2], ARGV[4])
+        return 1
+    """
+    REMOVE = """
+        if redis.call('exists', KEYS[1]) == 0 then return nil end
+        if redis.call('hdel', KEYS[1], ARGV[1]) == 0 then return 0 end
+        redis.call('expire', KEYS[1], ARGV[2])
+        redis.call('sadd', KEYS[2], ARGV[3])
+        return 1
+    """
+    APPLY = """
+        if redis.call('exists', KEYS[1]) == 0 then return nil end
+        for i = 3, #ARGV, 3 do
+            if ARGV[i] == 'add' then
+                redis.call('hincrby', KEYS[1], ARGV[i + 1], ARGV[i + 2])
+            elseif ARGV[i] == 'set' then
+                redis.call('hset', KEYS[1], ARGV[i + 1], ARGV[i + 2])
+            else
+                redis.call('hdel', KEYS[1], ARGV[i + 1])
+            end
+        end
+        redis.call('expire', KEYS[1], ARGV[1])
+        redis.call('sadd', KEYS[2], ARGV[2])
+        return 1
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(settings.STORE_CART_REDIS_ALIAS)
+        self.ttl = settings.STORE_CART_TTL
+        self.increment_script = self.client.register_script(self.INCREMENT)
+        self.set_quantity_script = self.client.register_script(self.SET_QUANTITY)
+        self.remove_script = self.client.register_script(self.REMOVE)
+        self.apply_script = self.client.register_script(self.APPLY)
+
+    def key(self, cart_id):
+        return CART_KEY_PREFIX + cart_id
+
+    def read(self, cart_id):
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.key(cart_id))
+        pipe.expire(self.key(cart_id), self.ttl)
+        fields, _ = pipe.execute()
+        if not fields:
+            return None
+        return {int(field): int(value) for field, value in fields.items() if field != MARKER.encode()}
+
+    def write(self, cart_id, items):
+        pipe = self.client.pipeline()
+        pipe.hset(self.key(cart_id), mapping={MARKER: 1, **items})
+        pipe.expire(self.key(cart_id), self.ttl)
+        pipe.execute()
+
+    def increment(self, cart_id, product_id, quantity):
+        return self.increment_script(keys=[self.key(cart_id), DIRTY_CARTS_KEY],
+                                     args=[product_id, quantity, self.ttl, cart_id])
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        found = self.set_quantity_script(keys=[self.key(cart_id), DIRTY_CARTS_KEY],
+                                         args=[product_id, quantity, self.ttl, cart_id])
+        return None if found is None else bool(found)
+
+    def remove(self, cart_id, product_id):
+        found = self.remove_script(keys=[self.key(cart_id), DIRTY_CARTS_KEY],
+                                   args=[product_id, self.ttl, cart_id])
+        return None if found is None else bool(found)
+
+    def apply(self, cart_id, folded):
+        args = [self.ttl, cart_id]
+        for product_id, (op, quantity) in folded.items():
+            args += [op, product_id, quantity or 0]
+        return self.apply_script(keys=[self.key(cart_id), DIRTY_CARTS_KEY], args=args)
+
+    def discard(self, cart_id):
+        pipe = self.client.pipeline()
+        pipe.delete(self.key(cart_id))
+        pipe.srem(DIRTY_CARTS_KEY, cart_id)
+        pipe.execute()
+
+    def mark_dirty(self, cart_ids):
+        self.client.sadd(DIRTY_CARTS_KEY, *cart_ids)
+
+    def pop_dirty(self, count):
+        return [cart_id.decode() for cart_id in self.client.spop(DIRTY_CARTS_KEY, count) or []]
+
+
+class InMemoryCartStore(WriteBehindCartStore):
+    """Process-local stand-in for RedisCartStore, used by the tests. Nothing expires."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.carts = {}
+        self.dirty = set()
+
+    def read(self, cart_id):
+        with self.lock:
+            items = self.carts.get(cart_id)
+            return None if items is None else dict(items)
+
+    def write(self, cart_id, items):
+        with self.lock:
+            self.carts.setdefault(cart_id, {}).update(items)
+
+    def increment(self, cart_id, product_id, quantity):
+        with self.lock:
+            items = self.carts.get(cart_id)
+            if items is None:
+                return None
+            items[product_id] = items.get(product_id, 0) + quantity
+            self.dirty.add(cart_id)
+            return items[product_id]
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        with self.lock:
+            items = self.carts.get(cart_id)
+            if items is None:
+                return None
+            if product_id not in items:
+                return False
+            items[product_id] = quantity
+            self.dirty.add(cart_id)
+            return True
+
+    def remove(self, cart_id, product_id):
+        with self.lock:
+            items = self.carts.get(cart_id)
+            if items is None:
+                return None
+            if items.pop(product_id, None) is None:
+                return False
+            self.dirty.add(cart_id)
+            return True
+
+    def apply(self, cart_id, folded):
+        with self.lock:
+            items = self.carts.get(cart_id)
+            if items is None:
+                return None
+            for product_id, (op, quantity) in folded.items():
+                if op == ADD:
+                    items[product_id] = items.get(product_id, 0) + quantity
+                elif op == SET:
+                    items[product_id] = quantity
+                else:
+                    items.pop(product_id, None)
+            self.dirty.add(cart_id)
+            return True
+
+    def discard(self, cart_id):
+        with self.lock:
+            self.carts.pop(cart_id, None)
+            self.dirty.discard(cart_id)
+
+    def mark_dirty(self, cart_ids):
+        with self.lock:
+            self.dirty.update(cart_ids)
+
+    def pop_dirty(self, count):
+        with self.lock:
+            cart_ids = list(self.dirty)[:count]
+            self.dirty.difference_update(cart_ids)
+            return cart_ids
+
+
+_stores = {}
+
+
+def get_cart_store():
+    path = settings.STORE_CART_BACKEND
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
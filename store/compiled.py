@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import models
+from rest_framework import serializers
+
+
+ATTRIBUTE = 'attribute'
+PRIMARY_KEY = 'primary_key'
+METHOD = 'method'
+NESTED = 'nested'
+NESTED_MANY = 'nested_many'
+FIELD = 'field'
+
+# Fields whose to_representation() is the identity for the Python type the
+# model column already holds (int for IntegerField, str for CharField).
+IDENTITY_FIELDS = {
+    serializers.IntegerField: serializers.IntegerField.to_representation,
+    serializers.CharField: serializers.CharField.to_representation,
+    serializers.ReadOnlyField: serializers.ReadOnlyField.to_representation,
+}
+
+
+class Row:
+    """
+    Attribute access over a `.values()` row, with `product__title` exposed
+    as `row.product.title`, so compiled serializers accept either rows or
+    model instances.
+    """
+
+    def __init__(self, values):
+        nested = {}
+        for key, value in values.items():
+            name, _, rest = key.partition('__')
+            if rest:
+                nested.setdefault(name, {})[rest] = value
+            else:
+                self.__dict__[name] = value
+        for name, child in nested.items():
+            self.__dict__[name] = Row(child)
+
+
+def field_kind(field):
+    if isinstance(field, serializers.ListSerializer):
+        return NESTED_MANY
+    if isinstance(field, serializers.BaseSerializer):
+        return NESTED
+    if isinstance(field, serializers.SerializerMethodField):
+        return METHOD
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return PRIMARY_KEY
+    for field_class, to_representation in IDENTITY_FIELDS.items():
+        if isinstance(field, field_class) and type(field).to_representation is to_representation:
+            return ATTRIBUTE
+    return FIELD
+
+
+@lru_cache(maxsize=None)
+def compile_plan(serializer_class, field_names):
+    """
+    Works out once per serializer class how every readable field is read:
+    copied straight from the attribute, read as a foreign key id, passed
+    to a method, recursed into, or handed to the field's to_representation.
+    """
+    fields = serializer_class().fields
+    plan = []
+    for name in field_names:
+        field = fields[name]
+        source_attrs = tuple(field.source_attrs)
+        if field_kind(field) == PRIMARY_KEY:
+            source_attrs = source_attrs[:-1] + (source_attrs[-1] + '_id',)
+        plan.append((name, field_kind(field), source_attrs))
+    return tuple(plan)
+
+
+@lru_cache(maxsize=None)
+def compile_function(serializer_class, field_names):
+    """
+    Builds once per serializer class and field set the flat function
+    turning one instance (or Row) into the OrderedDict that
+    `to_representation()` would. Method fields, field conversions and
+    nested serializers belong to a serializer instance and its context, so
+    their converters are passed in at call time, one per field.
+    """
+    steps = tuple((name, source_attrs) for name, _, source_attrs in compile_plan(serializer_class, field_names))
+
+    def to_representation(instance, converters):
+        ret = OrderedDict()
+        for (name, source_attrs), convert in zip(steps, converters):
+            value = instance
+            for attr in source_attrs:
+                value = getattr(value, attr)
+                if value is None:
+                    break
+            if value is None:
+                ret[name] = None
+            elif convert is None:
+                ret[name] = value
+            else:
+                ret[name] = convert(value)
+        return ret
+
+    return to_representation
+
+
+def bind(serializer):
+    """The compiled function for `serializer` and its bound converters."""
+    fields = serializer.fields
+    readable = tuple(field.field_name for field in serializer._readable_fields)
+    converters = []
+    for name, kind, _ in compile_plan(type(serializer), readable):
+        field = fields[name]
+        if kind == METHOD:
+            convert = getattr(field.parent, field.method_name)
+        elif kind == NESTED:
+            convert = compile_serializer(field)
+        elif kind == NESTED_MANY:
+            convert = compile_many(field.child)
+        elif kind == FIELD:
+            convert = field.to_representation
+        else:
+            convert = None
+        converters.append(convert)
+    return compile_function(type(serializer), readable), tuple(converters)
+
+
+def compile_serializer(serializer):
+    """
+    Returns a function turning one instance (or Row) into the same
+    OrderedDict that `serializer.to_representation()` would build.
+    """
+    to_representation, converters = bind(serializer)
+    return lambda instance: to_representation(instance, converters)
+
+
+def compile_many(child):
+    to_representation, converters = bind(child)
+
+    def to_list(data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return [to_representation(item, converters) for item in iterable]
+
+    return to_list
+
+
+def values_fields(serializer_class, prefix=''):
+    """
+    The `.values()` names a compiled serializer needs, or None if it nests a
+    to-many relation that cannot come from a flat row.
+    """
+    serializer = serializer_class()
+    readable = tuple(field.field_name for field in serializer._readable_fields)
+    names = []
+    for name, kind, source_attrs in compile_plan(serializer_class, readable):
+        if kind == NESTED_MANY:
+            return None
+        if kind == NESTED:
+            nested = values_fields(type(serializer.fields[name]), prefix + '__'.join(source_attrs) + '__')
+            if nested is None:
+                return None
+            names += nested
+        elif kind != METHOD:
+            names.append(prefix + '__'.join(source_attrs))
+    return names
+
+
+def serialize_values(serializer_class, queryset, context=None):
+    """
+    Serializes straight from `.values()` rows, skipping model instantiation.
+    Method fields receive a Row, so they may only read fetched columns.
+    """
+    names = values_fields(serializer_class)
+    if names is None:
+        raise ValueError(f'{serializer_class.__name__} cannot be serialized from flat rows')
+    to_representation, converters = bind(serializer_class(context=context or {}))
+    return [to_representation(Row(values), converters) for values in queryset.values(*names)]
+
+
+class CompiledListSerializer(serializers.ListSerializer):
+    """
+    Renders every row through a compiled function when
+    STORE_COMPILED_SERIALIZERS is on; the output matches ListSerializer's.
+    """
+
+    def to_representation(self, data):
+        if not settings.STORE_COMPILED_SERIALIZERS:
+            return super().to_representation(data)
+        return compile_many(self.child)(data)
@@ -0,0 +1,136 @@
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+PENDING_LIKES_KEY = 'store:likes:pending'
+
+
+class LikeCounter:
+    """
+    Where changes to Product.likes_count go when a product is liked or
+    unliked. Buffering counters keep {product_id: delta} and flush() adds
+    the deltas to the column in batches; the column plus the pending delta
+    is the live count.
+
+    flush() subtracts what it wrote only after the UPDATE commits, so a
+    crash in between counts those likes twice; recount_likes repairs that.
+    """
+
+    def add(self, product_id, delta):
+        raise NotImplementedError
+
+    def pending(self, product_ids):
+        """{product_id: delta} not yet written to the database."""
+        return {}
+
+    def take(self, count):
+        """Up to `count` pending deltas, left in place until settle()."""
+        return {}
+
+    def settle(self, deltas):
+        """Subtracts flushed deltas, keeping any added since take()."""
+
+    def count(self, product_id):
+        likes_count = Product.objects.filter(pk=product_id).values_list('likes_count', flat=True).first() or 0
+        return likes_count + self.pending([product_id]).get(product_id, 0)
+
+    def flush(self, batch_size):
+        deltas = self.take(batch_size)
+        if not deltas:
+            return 0
+        Product.objects.adjust_likes_count(deltas)
+        self.settle(deltas)
+        return len(deltas)
+
+
+class DatabaseLikeCounter(LikeCounter):
+    """Writes every change straight to the column; nothing is buffered."""
+
+    def add(self, product_id, delta):
+        Product.objects.adjust_likes_count({product_id: delta})
+
+
+class RedisLikeCounter(LikeCounter):
+    """
+    Buffers deltas in one Redis hash of product id to delta. HINCRBY keeps
+    concurrent likes atomic; settling removes fields that drop to zero.
+    """
+
+    SETTLE = """
+        for i = 1, #ARGV, 2 do
+            if redis.call('hincrby', KEYS[1], ARGV[i], -ARGV[i + 1]) == 0 then
+                redis.call('hdel', KEYS[1], ARGV[i])
+            end
+        end
+        return 1
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(settings.STORE_LIKE_REDIS_ALIAS)
+        self.settle_script = self.client.register_script(self.SETTLE)
+
+    def add(self, product_id, delta):
+        self.client.hincrby(PENDING_LIKES_KEY, product_id, delta)
+
+    def pending(self, product_ids):
+        values = self.client.hmget(PENDING_LIKES_KEY, list(product_ids))
+        return {product_id: int(value) for product_id, value in zip(product_ids, values) if value is not None}
+
+    def take(self, count):
+        # Small hashes come back whole from one HSCAN, large ones in pages.
+        _, fields = self.client.hscan(PENDING_LIKES_KEY, 0, count=count)
+        deltas = {int(product_id): int(delta) for product_id, delta in fields.items()}
+        return dict(list(deltas.items())[:count])
+
+    def settle(self, deltas):
+        args = []
+        for product_id, delta in deltas.items():
+            args += [product_id, delta]
+        self.settle_script(keys=[PENDING_LIKES_KEY], args=args)
+
+
+class InMemoryLikeCounter(LikeCounter):
+    """Process-local stand-in for RedisLikeCounter, used by the tests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.deltas = {}
+
+    def add(self, product_id, delta):
+        with self.lock:
+            self.deltas[product_id] = self.deltas.get(product_id, 0) + delta
+
+    def pending(self, product_ids):
+        with self.lock:
+            return {product_id: self.deltas[product_id] for product_id in product_ids if product_id in self.deltas}
+
+    def take(self, count):
+        with self.lock:
+            return dict(list(self.deltas.items())[:count])
+
+    def settle(self, deltas):
+        with self.lock:
+            for product_id, delta in deltas.items():
+                remaining = self.deltas.get(product_id, 0) - delta
+                if remaining:
+                    self.deltas[product_id] = remaining
+                else:
+                    self.deltas.pop(product_id, None)
+
+
+_counters = {}
+
+
+def get_like_counter():
+    path = settings.STORE_LIKE_COUNTER_BACKEND
+    if path not in _counters:
+        _counters[path] = import_string(path)()
+    return _counters[path]
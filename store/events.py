@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import OrderEvent
+
+
+SCHEDULED_KEY = 'store:order-events:scheduled'
+
+
+def order_created(order):
+    """
+    Records that `order` was created, in the caller's transaction. Receivers
+    of store.signals.order_created are called by a Celery task after commit,
+    so their cost is not part of checkout.
+    """
+    OrderEvent.objects.create(order=order, name=OrderEvent.CREATED)
+    transaction.on_commit(schedule_dispatch)
+
+
+def schedule_dispatch():
+    """
+    Queues one dispatch per STORE_ORDER_EVENT_WINDOW seconds. Events that are
+    committed while a dispatch is queued are sent by that dispatch.
+    """
+    from .tasks import dispatch_order_events
+    window = settings.STORE_ORDER_EVENT_WINDOW
+    if not window:
+        dispatch_order_events.delay()
+    elif cache.add(SCHEDULED_KEY, True, timeout=window * 2):
+        dispatch_order_events.apply_async(countdown=window)
@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from rest_framework import serializers
+
+from .models import Order, OrderItem
+
+
+FORMATS = ['ndjson', 'csv']
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+ORDER_COLUMNS = ['id', 'placed_at', 'payment_status', 'customer_id']
+ITEM_COLUMNS = ['id', 'product_id', 'product_title', 'quantity', 'unit_price']
+CSV_HEADER = ['order_' + name if name == 'id' else name for name in ORDER_COLUMNS] + \
+    ['item_id' if name == 'id' else name for name in ITEM_COLUMNS]
+
+
+class OrderExportFilterSerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=FORMATS, default='ndjson')
+    placed_after = serializers.DateTimeField(required=False)
+    placed_before = serializers.DateTimeField(required=False)
+    payment_status = serializers.ChoiceField(choices=Order.PAYMENT_STATUS_CHOICES, required=False)
+
+
+def filter_orders(placed_after=None, placed_before=None, payment_status=None, **kwargs):
+    queryset = Order.objects.all()
+    if placed_after is not None:
+        queryset = queryset.filter(placed_at__gte=placed_after)
+    if placed_before is not None:
+        queryset = queryset.filter(placed_at__lt=placed_before)
+    if payment_status is not None:
+        queryset = queryset.filter(payment_status=payment_status)
+    return queryset
+
+
+def iter_orders(queryset, chunk_size=2000):
+    """
+    Yields order dicts with their items, reading orders through a
+    server-side cursor and loading the items of each chunk in one query.
+    """
+    orders = queryset.order_by('pk').values(*ORDER_COLUMNS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(orders, chunk_size))
+        if not chunk:
+            return
+        items = {}
+        for item in OrderItem.objects \
+                .filter(order_id__in=[order['id'] for order in chunk]) \
+                .order_by('order_id', 'pk') \
+                .values('order_id', 'id', 'product_id', 'quantity', 'unit_price', product_title=F('product__title')):
+            items.setdefault(item.pop('order_id'), []).append(item)
+        for order in chunk:
+            order['items'] = items.get(order['id'], [])
+            yield order
+
+
+def ndjson_lines(orders):
+    for order in orders:
+        yield json.dumps(order, cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(orders):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for order in orders:
+        head = [order[name] for name in ORDER_COLUMNS]
+        for item in order['items'] or [{}]:
+            writer.writerow(head + [item.get(name) for name in ITEM_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_lines(queryset, file_format, chunk_size=2000):
+    orders = iter_orders(queryset, chunk_size)
+    if file_format == 'csv':
+        return csv_lines(orders)
+    return ndjson_lines(orders)
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .tagging import tagged_products
+
+
+COLLECTION = 'collection'
+PRICE = 'price'
+TAG = 'tag'
+FACETS = [COLLECTION, PRICE, TAG]
+
+# Query parameters that page or order the listing without changing the
+# products the facets are counted over.
+IGNORED_PARAMS = {'page', 'cursor', 'count', 'ordering', 'facets'}
+
+
+def parse_facets(query_params):
+    names = {name.strip() for name in query_params.get('facets', '').split(',') if name.strip()}
+    unknown = names - set(FACETS)
+    if unknown:
+        raise ValidationError({'facets': [f'Expected any of {", ".join(FACETS)}.']})
+    return sorted(names)
+
+
+def filter_params(query_params, names):
+    """The normalized filter set the facets depend on, as a cache key."""
+    params = {key: sorted(query_params.getlist(key)) for key in query_params if key not in IGNORED_PARAMS}
+    params['facets'] = names
+    return params
+
+
+def price_buckets():
+    """[(min, max)] around STORE_PRICE_FACET_BOUNDARIES; min is inclusive, None is open."""
+    boundaries = [None, *settings.STORE_PRICE_FACET_BOUNDARIES, None]
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def bucket_filter(lower, upper):
+    condition = Q()
+    if lower is not None:
+        condition &= Q(unit_price__gte=lower)
+    if upper is not None:
+        condition &= Q(unit_price__lt=upper)
+    return condition
+
+
+def compute_facets(queryset, names):
+    """
+    Counts the products of `queryset` per collection, per price bucket and
+    per tag. Collections and price buckets come from one grouped pass with
+    a conditional count per bucket; tags, which need the join, from one
+    more query.
+    """
+    queryset = queryset.order_by().prefetch_related(None)
+    facets = {}
+    if COLLECTION in names or PRICE in names:
+        buckets = price_buckets()
+        rows = list(queryset
+                    .values('collection_id', 'collection__title')
+                    .annotate(count=Count('pk'),
+                              **{f'price_{i}': Count('pk', filter=bucket_filter(*bucket))
+                                 for i, bucket in enumerate(buckets)})
+                    .order_by('-count', 'collection_id'))
+        if COLLECTION in names:
+            facets[COLLECTION] = [{'id': row['collection_id'], 'title': row['collection__title'], 'count': row['count']}
+                                  for row in rows]
+        if PRICE in names:
+            facets[PRICE] = [{'min': lower, 'max': upper, 'count': sum(row[f'price_{i}'] for row in rows)}
+                             for i, (lower, upper) in enumerate(buckets)]
+    if TAG in names:
+        items = tagged_products()
+        tags = [] if items is None else items \
+            .filter(object_id__in=queryset.values('pk')) \
+            .values('tag__label') \
+            .annotate(count=Count('object_id', distinct=True)) \
+            .order_by('-count', 'tag__label')[:settings.STORE_TAG_FACET_LIMIT]
+        facets[TAG] = [{'label': row['tag__label'], 'count': row['count']} for row in tags]
+    return facets
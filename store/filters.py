@@ -1,10 +1,34 @@
-from django_filters.rest_framework import FilterSet
+from django_filters.rest_framework import CharFilter, FilterSet
+from rest_framework.filters import SearchFilter
+
 from .models import Product
+from .search import get_search_backend
+from .tagging import tagged
+
 
 class ProductFilter(FilterSet):
+    tag = CharFilter(method='filter_tag')
+    tags__all = CharFilter(method='filter_all_tags', help_text='Comma-separated tag labels')
+    
+    def filter_tag(self, queryset, name, value):
+        return queryset.filter(tagged(value))
+    
+    def filter_all_tags(self, queryset, name, value):
+        for label in {label.strip() for label in value.split(',') if label.strip()}:
+            queryset = queryset.filter(tagged(label))
+        return queryset
+    
     class Meta:
         model = Product
         fields = {
             'collection_id': ['exact'],
             'unit_price': ['gt', 'lt']
-        }
\ No newline at end of file
+        }
+
+
+class ProductSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return get_search_backend().search(queryset, ' '.join(search_terms))
@@ -0,0 +1,147 @@
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_progress'
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def scoped_key(request, key):
+    # Keys only have to be unique per client, so they are scoped to the user.
+    # Anonymous keys are UUIDs, which no other client can guess.
+    raw = '|'.join([str(request.user.id or ''), request.method, request.path, key])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def is_random_uuid(key):
+    try:
+        return uuid.UUID(key).version == 4
+    except ValueError:
+        return False
+
+
+def fingerprint(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def cache_key(key):
+    return f'store:idempotency:{key}'
+
+
+def lock_key(key):
+    return f'store:idempotency:lock:{key}'
+
+
+def load(key):
+    """
+    Returns the stored response for `key` as a dict, or None. The cache is
+    read first; the table keeps responses the cache has evicted or lost.
+    """
+    stored = cache.get(cache_key(key))
+    if stored is None:
+        stored = IdempotencyKey.objects \
+            .filter(key=key, created_at__gte=timezone.now() - timedelta(seconds=settings.STORE_IDEMPOTENCY_TTL)) \
+            .values('fingerprint', 'status_code', 'content_type', 'content') \
+            .first()
+        if stored is not None:
+            stored['content'] = bytes(stored['content'])
+            cache.set(cache_key(key), stored, timeout=settings.STORE_IDEMPOTENCY_TTL)
+    return stored
+
+
+def save(key, stored):
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key, **stored)
+    except IntegrityError:
+        # An expired record under the same key.
+        IdempotencyKey.objects.filter(key=key).update(created_at=timezone.now(), **stored)
+    cache.set(cache_key(key), stored, timeout=settings.STORE_IDEMPOTENCY_TTL)
+
+
+def replay(stored):
+    response = HttpResponse(stored['content'], status=stored['status_code'], content_type=stored['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """
+    Makes a view method safe to retry with an Idempotency-Key header. The
+    first response below 500 is stored for STORE_IDEMPOTENCY_TTL and sent
+    again, byte for byte, for every retry with the same key and body. While
+    the first request runs, a cache lock answers duplicates with 409.
+
+    Anonymous clients share one key space and a replayed cart id is the
+    cart's only credential, so their keys must be random UUIDs.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: [f'Must be 1 to {MAX_KEY_LENGTH} characters long.']})
+        if not request.user.is_authenticated and not is_random_uuid(key):
+            raise ValidationError({HEADER: ['Must be a random (version 4) UUID for anonymous requests.']})
+
+        key = scoped_key(request, key)
+        request_fingerprint = fingerprint(request)
+        stored = load(key)
+        if stored is None:
+            token = uuid.uuid4().hex
+            if not cache.add(lock_key(key), token, timeout=settings.STORE_IDEMPOTENCY_LOCK_TIMEOUT):
+                raise RequestInProgress()
+            try:
+                # The first request may have finished before the lock was taken.
+                stored = load(key)
+                if stored is None:
+                    try:
+                        response = handler(view, request, *args, **kwargs)
+                    except Exception as exc:
+                        # Re-raises errors that would be a 500.
+                        response = view.handle_exception(exc)
+                    response = view.finalize_response(request, response, *args, **kwargs)
+                    response.render()
+                    if response.status_code >= 500:
+                        return response
+                    stored = {
+                        'fingerprint': request_fingerprint,
+                        'status_code': response.status_code,
+                        'content_type': response['Content-Type'],
+                        'content': response.content,
+                    }
+                    save(key, stored)
+                    return response
+            finally:
+                if cache.get(lock_key(key)) == token:
+                    cache.delete(lock_key(key))
+
+        if stored['fingerprint'] != request_fingerprint:
+            raise KeyReused()
+        return replay(stored)
+    return wrapper
@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import cache
+from .models import Collection, Product
+from .search import get_search_backend
+
+
+FORMATS = ['csv', 'ndjson']
+PRODUCT_FIELDS = ['title', 'description', 'unit_price', 'inventory']
+MAX_REPORTED_ERRORS = 100
+
+
+class CatalogRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=50)
+    title = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    unit_price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0, required=False)
+    inventory = serializers.IntegerField(required=False)
+    collection = serializers.CharField(max_length=255, required=False)
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'ndjson'
+    return 'csv'
+
+
+def read_rows(stream, file_format):
+    """
+    Yields one dict per CSV record or NDJSON line without reading the
+    whole file. Empty or missing CSV cells are treated as missing columns.
+    A file that is not UTF-8 ends with an error row.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if file_format not in FORMATS:
+        raise ValueError(f'Unsupported format: {file_format}')
+    try:
+        if file_format == 'csv':
+            for row in csv.DictReader(stream):
+                yield {key: value for key, value in row.items() if key and value not in ('', None)}
+        else:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield row if isinstance(row, dict) else {'__error__': 'Expected a JSON object.'}
+    except UnicodeDecodeError:
+        # Decoding runs ahead of the rows, so the rest of the file is dropped.
+        yield {'__error__': 'The file is not valid UTF-8; no further rows were read.'}
+
+
+class ChunkedRowImporter:
+    """
+    Validates numbered rows with `row_serializer` chunk by chunk, so memory
+    does not grow with the file, and hands each chunk's valid rows to
+    `import_rows()`. Invalid rows are counted and the first
+    MAX_REPORTED_ERRORS of them reported with their line numbers.
+    """
+
+    row_serializer = None
+    # Result counters of the subclass, reported between 'rows' and 'invalid'.
+    counters = ()
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        # One instance validates every row, so its fields are built once.
+        self.validator = self.row_serializer()
+        self.result = {'rows': 0, **{name: 0 for name in self.counters}, 'invalid': 0, 'errors': []}
+
+    def run(self, rows):
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                return self.result
+            valid = self.validate_chunk(chunk)
+            if valid:
+                self.import_rows(valid)
+
+    def validate_chunk(self, chunk):
+        self.result['rows'] += len(chunk)
+        valid = []
+        for line, row in chunk:
+            if '__error__' in row:
+                self.add_error(line, row['__error__'])
+                continue
+            try:
+                valid.append((line, self.validator.run_validation(row)))
+            except serializers.ValidationError as e:
+                self.add_error(line, e.detail)
+        return valid
+
+    def import_rows(self, valid):
+        """Writes one chunk of (line, validated data) pairs."""
+        raise NotImplementedError
+
+    def add_error(self, line, errors):
+        self.result['invalid'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'row': line, 'errors': errors})
+
+
+class CatalogImporter(ChunkedRowImporter):
+    """
+    Upserts products (matched by slug) and collections (matched by title)
+    chunk by chunk. Only products whose values actually differ are written,
+    which keeps `last_update` and cache invalidation to the rows that
+    changed.
+    """
+
+    row_serializer = CatalogRowSerializer
+    counters = ('created', 'updated', 'unchanged', 'collections_created')
+
+    def import_rows(self, valid):
+        with transaction.atomic():
+            collection_ids = self.resolve_collections({data['collection'] for _, data in valid if 'collection' in data})
+            existing = {}
+            for product in Product.objects.filter(slug__in={data['slug'] for _, data in valid}).order_by('pk'):
+                existing.setdefault(product.slug, product)
+            loaded_collection_ids = {product.pk: product.collection_id for product in existing.values()}
+
+            to_create = {}
+            to_update = {}
+            changed_fields = set()
+            unchanged = 0
+            now = timezone.now()
+            for line, data in valid:
+                values = {name: data[name] for name in PRODUCT_FIELDS if name in data}
+                if 'collection' in data:
+                    values['collection_id'] = collection_ids[data['collection']]
+                product = existing.get(data['slug']) or to_create.get(data['slug'])
+                if product is None:
+                    missing = [name for name in ['title', 'unit_price', 'inventory', 'collection_id'] if name not in values]
+                    if missing:
+                        self.add_error(line, {name.replace('_id', ''): ['This field is required for new products.']
+                                              for name in missing})
+                        continue
+                    to_create[data['slug']] = Product(slug=data['slug'], **values)
+                    continue
+                changed = [name for name, value in values.items() if getattr(product, name) != value]
+                for name in changed:
+                    setattr(product, name, values[name])
+                if product.pk is None:
+                    continue
+                if changed:
+                    product.last_update = now
+                    changed_fields.update(changed)
+                    to_update[product.pk] = product
+                elif product.pk not in to_update:
+                    unchanged += 1
+
+            # Only the rows written invalidate cached responses, as their
+            # own saves would; re-importing an unchanged file bumps nothing.
+            if to_create:
+                scopes = {('catalog',), ('collections',)}
+                scopes.update(('collection', product.collection_id) for product in to_create.values())
+                Product.objects.bulk_create(to_create.values(), batch_size=self.chunk_size, scopes=scopes)
+            if to_update:
+                scopes = set()
+                for pk, product in to_update.items():
+                    scopes.update(cache.product_scopes(pk, {loaded_collection_ids[pk], product.collection_id}))
+                    if loaded_collection_ids[pk] != product.collection_id:
+                        # products_count of the collections changed
+                        scopes.add(('collections',))
+                # An upsert on the primary key writes only the changed columns
+                # and is much cheaper to build than bulk_update's CASE chains.
+                Product.objects.bulk_create(to_update.values(), batch_size=self.chunk_size,
+                                            update_conflicts=True, unique_fields=['id'],
+                                            update_fields=sorted(changed_fields | {'last_update'}),
+                                            scopes=scopes)
+
+        self.result['created'] += len(to_create)
+        self.result['updated'] += len(to_update)
+        self.result['unchanged'] += unchanged
+        reindex = [product.pk for product in to_create.values()]
+        if changed_fields & {'title', 'description'}:
+            reindex += list(to_update)
+        if reindex:
+            get_search_backend().update(reindex)
+
+    def resolve_collections(self, titles):
+        if not titles:
+            return {}
+        collection_ids = {}
+        for title, pk in Collection.objects.filter(title__in=titles).order_by('pk').values_list('title', 'pk'):
+            collection_ids.setdefault(title, pk)
+        missing = [Collection(title=title) for title in titles if title not in collection_ids]
+        if missing:
+            for collection in Collection.objects.bulk_create(missing):
+                collection_ids[collection.title] = collection.pk
+            self.result['collections_created'] += len(missing)
+            cache.bump_on_commit(('collections',))
+        return collection_ids
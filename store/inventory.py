@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.db import OperationalError, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import cache
+from .models import Product
+
+
+# serialization_failure and deadlock_detected
+RETRYABLE_PGCODES = {'40001', '40P01'}
+
+
+class InsufficientInventory(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Not enough inventory.'
+    default_code = 'insufficient_inventory'
+
+    def __init__(self, product_ids):
+        super().__init__()
+        self.product_ids = product_ids
+        self.detail = {'detail': self.detail, 'product_ids': product_ids}
+
+
+# One statement both checks and takes the stock, so two checkouts can never
+# sell the same unit, and only the product row itself is locked.
+RESERVE = """
+    UPDATE {product} SET inventory = inventory - %s
+    WHERE id = %s AND inventory >= %s
+    RETURNING collection_id
+"""
+
+
+def reserve(quantities):
+    """
+    Takes {product_id: quantity} out of Product.inventory inside the current
+    transaction. Products are updated in id order, so concurrent checkouts
+    lock rows in the same order and cannot deadlock. Raises
+    InsufficientInventory with every product that is short.
+    """
+    sql = RESERVE.format(product=connection.ops.quote_name(Product._meta.db_table))
+    scopes = []
+    short = []
+    with connection.cursor() as cursor:
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            cursor.execute(sql, [quantity, product_id, quantity])
+            row = cursor.fetchone()
+            if row is None:
+                short.append(product_id)
+            else:
+                scopes += cache.product_scopes(product_id, [row[0]])
+    if short:
+        raise InsufficientInventory(short)
+    # The UPDATE bypasses the model signals, so the catalog cache is told here.
+    cache.bump_on_commit(*set(scopes))
+
+
+def is_retryable(error):
+    return getattr(error.__cause__, 'pgcode', None) in RETRYABLE_PGCODES
+
+
+def atomic_with_retries(func, attempts=3, backoff=0.05):
+    """
+    Runs `func` in a transaction, retrying serialization failures and
+    deadlocks with jittered exponential backoff. Inside an outer transaction
+    a failure cannot be retried, so `func` simply runs once there.
+    """
+    if connection.in_atomic_block:
+        with transaction.atomic():
+            return func()
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as error:
+            if attempt == attempts or not is_retryable(error):
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
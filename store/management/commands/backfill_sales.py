@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from store import analytics
+
+
+class Command(BaseCommand):
+    help = 'Counts past orders into the daily sales rollups, chunk by chunk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Empty the rollups and count every order again')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            analytics.reset_sales()
+        # Stops at the same cutoff as roll_up_sales, which goes on from there.
+        until = analytics.rollup_cutoff()
+        counted = 0
+        while True:
+            count = analytics.roll_up_chunk(options['chunk_size'], until)
+            counted += count
+            if count:
+                self.stdout.write(f'{counted} orders counted')
+            if count < options['chunk_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {counted} orders.'))
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.carts import get_cart_store
+from store.inventory import InsufficientInventory
+from store.models import Cart, Collection, Order, OrderItem, Product
+from store.serializers import CreateOrderSerializer
+
+
+class Command(BaseCommand):
+    help = 'Runs concurrent checkouts against a single hot product and reports checkouts per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--checkouts', type=int, default=500)
+        parser.add_argument('--inventory', type=int, default=None,
+                            help='Starting stock of the hot product, --checkouts by default')
+        parser.add_argument('--quantity', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError('SQLite fails concurrent write transactions instead of queueing them')
+        inventory = options['checkouts'] if options['inventory'] is None else options['inventory']
+
+        # Threads commit on their own connections, so the rows are created
+        # for real and removed again at the end.
+        collection = Collection.objects.create(title='Checkout benchmark')
+        product = Product.objects.create(title='Hot product', slug='hot-product', unit_price=1,
+                                         inventory=inventory, collection=collection)
+        user = get_user_model().objects.create(username='checkout-benchmark', email='checkout@example.com')
+        store = get_cart_store()
+        cart_ids = []
+        for _ in range(options['checkouts']):
+            cart_id = store.create().id
+            store.add_item(cart_id, product.id, options['quantity'])
+            cart_ids.append(cart_id)
+
+        def checkout(cart_id):
+            try:
+                serializer = CreateOrderSerializer(data={'cart_id': cart_id}, context={'user_id': user.id})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return True
+            except InsufficientInventory:
+                return False
+            finally:
+                connection.close()
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                placed = list(executor.map(checkout, cart_ids))
+            elapsed = time.perf_counter() - start
+
+            product.refresh_from_db()
+            sold = OrderItem.objects.filter(product=product).count() * options['quantity']
+            self.stdout.write(f'threads:          {options["threads"]}')
+            self.stdout.write(f'checkouts:        {len(placed)} in {elapsed:.2f}s '
+                              f'({len(placed) / elapsed:.1f}/s)')
+            self.stdout.write(f'placed:           {placed.count(True)}')
+            self.stdout.write(f'out of stock:     {placed.count(False)}')
+            self.stdout.write(f'inventory left:   {product.inventory}')
+            if product.inventory < 0 or sold + product.inventory != inventory:
+                raise CommandError(f'Inventory is inconsistent: {sold} sold out of {inventory}')
+            self.stdout.write(self.style.SUCCESS('No overselling.'))
+        finally:
+            orders = Order.objects.filter(customer__user=user)
+            OrderItem.objects.filter(order__in=orders).delete()
+            orders.delete()
+            for cart_id in cart_ids:
+                try:
+                    store.delete(cart_id)
+                except Cart.DoesNotExist:
+                    pass
+            product.delete()
+            collection.delete()
+            user.delete()
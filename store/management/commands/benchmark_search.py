@@ -0,0 +1,81 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from store.models import Collection, Product
+from store.search import get_search_backend
+
+
+WORDS = [
+    'bread', 'cheese', 'apple', 'banana', 'coffee', 'wine', 'salmon', 'pepper',
+    'shampoo', 'soap', 'pencil', 'paper', 'leash', 'collar', 'flour', 'sugar',
+    'cinnamon', 'basil', 'puzzle', 'doll', 'magazine', 'rose', 'tulip', 'lily',
+    'organic', 'fresh', 'frozen', 'mini', 'large', 'whole', 'sliced', 'dried',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compares the icontains search filter with the search backend on synthetic catalogs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--query', default='fresh bread')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        query = options['query']
+        backend = get_search_backend()
+        self.stdout.write(f'Backend: {backend.__class__.__name__}, query: {query!r}')
+        self.stdout.write(f'{"products":>10} {"icontains ms":>14} {"backend ms":>12}')
+
+        # Everything happens in one transaction that is rolled back at the end,
+        # so the benchmark never leaves synthetic products behind.
+        with transaction.atomic():
+            collection = Collection.objects.create(title='Benchmark')
+            created = 0
+            for size in sorted(options['sizes']):
+                created += self.create_products(collection, size - created)
+                backend.rebuild()
+                icontains = self.measure(lambda: self.icontains(query), options['repeat'])
+                ranked = self.measure(
+                    lambda: backend.search(Product.objects.all(), query), options['repeat'])
+                self.stdout.write(f'{size:>10} {icontains:>14.1f} {ranked:>12.1f}')
+            transaction.set_rollback(True)
+        backend.rebuild()
+
+    def icontains(self, query):
+        # Same SQL as rest_framework.filters.SearchFilter over ['title', 'description'].
+        queryset = Product.objects.all()
+        for term in query.split():
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset
+
+    def measure(self, build_queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(build_queryset()[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def create_products(self, collection, count, batch_size=5000):
+        rng = random.Random(count)
+        created = 0
+        while created < count:
+            batch = []
+            for _ in range(min(batch_size, count - created)):
+                title = ' '.join(rng.choices(WORDS, k=3)).title()
+                batch.append(Product(
+                    title=title,
+                    slug='-',
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    unit_price=Decimal(rng.randint(100, 99999)) / 100,
+                    inventory=rng.randint(0, 100),
+                    collection=collection))
+            Product.objects.bulk_create(batch)
+            created += len(batch)
+        return created
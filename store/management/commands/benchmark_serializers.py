@@ -0,0 +1,69 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from store.models import Cart, CartItem, Collection, Order, OrderItem, Product
+from store.serializers import CartItemSerializer, OrderItemSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = 'Times generic against compiled list serialization for several page sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[20, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        request = APIRequestFactory().get('/store/products/')
+        self.stdout.write(f'{"serializer":<22} {"rows":>6} {"generic ms":>11} {"compiled ms":>12} {"speedup":>8}')
+
+        # Rows are created in a transaction that is rolled back at the end.
+        with transaction.atomic():
+            products, cart_items, order_items = self.create_rows(sizes[-1])
+            cases = [
+                (ProductSerializer, products, {'request': request}),
+                (CartItemSerializer, cart_items, {}),
+                (OrderItemSerializer, order_items, {}),
+            ]
+            for serializer_class, rows, context in cases:
+                for size in sizes:
+                    page = rows[:size]
+                    generic = self.measure(serializer_class, page, context, False, options['repeat'])
+                    compiled = self.measure(serializer_class, page, context, True, options['repeat'])
+                    self.stdout.write(f'{serializer_class.__name__:<22} {size:>6} {generic:>11.2f} '
+                                      f'{compiled:>12.2f} {generic / compiled:>7.1f}x')
+            transaction.set_rollback(True)
+
+    def measure(self, serializer_class, page, context, compiled, repeat):
+        timings = []
+        with override_settings(STORE_COMPILED_SERIALIZERS=compiled):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                serializer_class(page, many=True, context=context).data
+                timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def create_rows(self, count):
+        collection = Collection.objects.create(title='Benchmark')
+        Product.objects.bulk_create([
+            Product(title=f'Product {i}', slug='-', description='Benchmark product',
+                    unit_price=Decimal(i % 9000 + 100) / 100, inventory=10, collection=collection)
+            for i in range(count)])
+        products = list(Product.objects.filter(collection=collection).prefetch_related('images'))
+
+        cart = Cart.objects.create()
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=p, quantity=2) for p in products])
+        cart_items = list(CartItem.objects.filter(cart=cart).select_related('product'))
+
+        user = get_user_model().objects.create(username='serializer-benchmark', email='benchmark@example.com')
+        order = Order.objects.create(customer=user.customer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=p, quantity=1, unit_price=p.unit_price) for p in products])
+        order_items = list(OrderItem.objects.filter(order=order).select_related('product'))
+        return products, cart_items, order_items
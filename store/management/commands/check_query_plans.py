@@ -0,0 +1,117 @@
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from likes.models import LikedItem
+from store.tagging import tagged
+from store.models import Cart, Collection, Order, Product
+from tags.models import Tag, TaggedItem
+
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\s*$', re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot catalog and order queries and fails on sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many synthetic products (rolled back afterwards) before explaining')
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}')
+
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            failures = []
+            for name, queryset in self.hot_querysets():
+                plan = queryset.explain()
+                if options['verbose_plans']:
+                    self.stdout.write(f'-- {name}\n{plan}\n')
+                tables = pattern.findall(plan)
+                if tables:
+                    failures.append(f'{name}: sequential scan on {", ".join(sorted(set(tables)))}')
+                else:
+                    self.stdout.write(f'ok    {name}')
+            transaction.set_rollback(True)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'FAIL  {failure}')
+            raise CommandError(f'{len(failures)} queries fall back to a sequential scan')
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes.'))
+
+    def hot_querysets(self):
+        collection_id = Product.objects.values_list('collection_id', flat=True).first() or 0
+        customer_id = Order.objects.values_list('customer_id', flat=True).first() or 0
+        product_type = ContentType.objects.get_for_model(Product)
+        return [
+            ('products ordered by title',
+             Product.objects.order_by('title')[:20]),
+            ('products in a collection',
+             Product.objects.filter(collection_id=collection_id).order_by('title')[:20]),
+            ('products in a collection within a price range',
+             Product.objects.filter(collection_id=collection_id, unit_price__gt=10, unit_price__lt=50)[:20]),
+            ('products ordered by unit_price',
+             Product.objects.order_by('unit_price')[:20]),
+            ('products ordered by last_update',
+             Product.objects.order_by('-last_update')[:20]),
+            ('orders of a customer',
+             Order.objects.filter(customer_id=customer_id).order_by('-placed_at', '-id')[:20]),
+            ('tags of a product',
+             TaggedItem.objects.filter(content_type=product_type, object_id=1)),
+            ('products with a tag',
+             Product.objects.filter(tagged('plan-check')).order_by('title')[:20]),
+            ('likes of a product',
+             LikedItem.objects.filter(content_type=product_type, object_id=1)),
+            ('abandoned carts',
+             Cart.objects.filter(created_at__lt=timezone.now() - timedelta(days=30)).order_by('created_at')[:1000]),
+            ('orders after the sales rollup watermark',
+             Order.objects.filter(placed_at__gt=timezone.now() - timedelta(days=1)).order_by('placed_at', 'id')[:1000]),
+        ]
+
+    def seed(self, count, batch_size=5000):
+        self.stdout.write(f'Seeding {count} products...')
+        rng = random.Random(count)
+        collections = Collection.objects.bulk_create(
+            [Collection(title=f'Plan check {i}') for i in range(50)])
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(title=f'Product {i}', slug='-', description='Plan check product',
+                        unit_price=Decimal(rng.randint(100, 99999)) / 100, inventory=10,
+                        collection=rng.choice(collections))
+                for i in range(start, min(start + batch_size, count))])
+
+        User = get_user_model()
+        customers = [User.objects.create(username=f'plan-check-{i}', email=f'plan-check-{i}@example.com').customer
+                     for i in range(100)]
+        Order.objects.bulk_create([Order(customer=rng.choice(customers)) for _ in range(count // 10)])
+
+        product_type = ContentType.objects.get_for_model(Product)
+        Tag.objects.bulk_create([Tag(label=f'plan-check-{i}') for i in range(200)])
+        tag = Tag.objects.create(label='plan-check')
+        TaggedItem.objects.bulk_create([
+            TaggedItem(tag=tag, content_type=product_type, object_id=rng.randint(1, count))
+            for _ in range(count // 10)])
+        # A user likes a product at most once.
+        LikedItem.objects.bulk_create([
+            LikedItem(user_id=customers[0].user_id, content_type=product_type, object_id=object_id)
+            for object_id in rng.sample(range(1, count + 1), count // 10)])
+
+        # Refresh planner statistics so the plans reflect the seeded volume.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import exporters
+
+
+class Command(BaseCommand):
+    help = 'Streams orders and their items as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exporters.FORMATS, default='ndjson', dest='file_format')
+        parser.add_argument('--placed-after')
+        parser.add_argument('--placed-before')
+        parser.add_argument('--payment-status')
+        parser.add_argument('--output', help='File to write to, stdout by default')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        data = {name: options[name] for name in ['file_format', 'placed_after', 'placed_before', 'payment_status']
+                if options[name] is not None}
+        filters = exporters.OrderExportFilterSerializer(data=data)
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        queryset = exporters.filter_orders(**filters.validated_data)
+        lines = exporters.export_lines(queryset, filters.validated_data['file_format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import FORMATS, CatalogImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upserts products and collections from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, dest='file_format')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = CatalogImporter(options['chunk_size']).run(read_rows(stream, file_format))
+        except OSError as e:
+            raise CommandError(e)
+        for error in result.pop('errors'):
+            self.stderr.write(f'Row {error["row"]}: {json.dumps(error["errors"])}')
+        self.stdout.write(self.style.SUCCESS(json.dumps(result)))
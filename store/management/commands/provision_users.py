@@ -0,0 +1,32 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import FORMATS, guess_format, read_rows
+from store.provisioning import UserProvisioner
+
+
+class Command(BaseCommand):
+    help = 'Creates users and their customers in bulk from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, dest='file_format')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int,
+                            help='Processes hashing passwords, 0 to hash in this process')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or guess_format(options['path'])
+        workers = options['workers']
+        if workers is None:
+            workers = settings.STORE_PROVISIONING_WORKERS
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = UserProvisioner(options['chunk_size'], workers).run(read_rows(stream, file_format))
+        except OSError as e:
+            raise CommandError(e)
+        for error in result.pop('errors'):
+            self.stderr.write(f'Row {error["row"]}: {json.dumps(error["errors"])}')
+        self.stdout.write(self.style.SUCCESS(json.dumps(result)))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+
+from store import cache
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Collection.products_count for collections that drifted'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = list(Collection.objects
+                           .annotate(actual_count=Count('products'))
+                           .exclude(products_count=F('actual_count'))
+                           .values_list('pk', flat=True))
+            Collection.objects.filter(pk__in=drifted).recount_products()
+        if drifted:
+            cache.bump(('products',))
+        self.stdout.write(self.style.SUCCESS(f'Fixed products_count of {len(drifted)} collections.'))
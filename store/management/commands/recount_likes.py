@@ -0,0 +1,32 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from likes.models import LikedItem
+from store.counters import get_like_counter
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Product.likes_count for products that drifted'
+
+    def handle(self, *args, **options):
+        # Buffered counts are written first so they are not counted twice. A
+        # like buffered while this runs can still be; running it again fixes that.
+        get_like_counter().flush(batch_size=10 ** 9)
+        likes = LikedItem.objects \
+            .filter(content_type=ContentType.objects.get_for_model(Product), object_id=OuterRef('pk')) \
+            .order_by() \
+            .values('object_id') \
+            .annotate(count=Count('pk')) \
+            .values('count')
+        with transaction.atomic():
+            drifted = list(Product.objects
+                           .annotate(actual_count=Coalesce(Subquery(likes), Value(0)))
+                           .exclude(likes_count=F('actual_count'))
+                           .values_list('pk', flat=True))
+            if drifted:
+                Product.objects.filter(pk__in=drifted).recount_likes()
+        self.stdout.write(self.style.SUCCESS(f'Fixed likes_count of {len(drifted)} products.'))
@@ -1,3 +1,4 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import connection
 from pathlib import Path
@@ -15,3 +16,8 @@ class Command(BaseCommand):
 
         with connection.cursor() as cursor:
             cursor.execute(sql)
+
+        # The raw inserts bypass the ORM, so the counters and the search
+        # index have to be brought up to date afterwards.
+        call_command('recount_collections')
+        call_command('rebuild_search_index')
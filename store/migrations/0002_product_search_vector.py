@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:57
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes only exist on PostgreSQL; other backends use the in-process
+# index from store.search and skip these statements.
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS store_product_search_vector_gin '
+    'ON store_product USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS store_product_title_trgm '
+    'ON store_product USING gin (title gin_trgm_ops)',
+    "UPDATE store_product SET search_vector = "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS store_product_title_trgm',
+    'DROP INDEX IF EXISTS store_product_search_vector_gin',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
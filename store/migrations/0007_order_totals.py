@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:22
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_totals(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    totals = OrderItem.objects \
+        .filter(order_id=OuterRef('pk')) \
+        .order_by() \
+        .values('order_id') \
+        .annotate(amount=Sum(ExpressionWrapper(F('quantity') * F('unit_price'),
+                                               output_field=DecimalField(max_digits=12, decimal_places=2))),
+                  count=Sum('quantity'))
+    Order.objects.update(
+        total_amount=Coalesce(Subquery(totals.values('amount')), Value(0),
+                              output_field=DecimalField(max_digits=12, decimal_places=2)),
+        item_count=Coalesce(Subquery(totals.values('count')), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(compute_totals, migrations.RunPython.noop),
+    ]
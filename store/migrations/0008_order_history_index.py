@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-placed_at', '-id'], include=('total_amount',), name='store_order_history_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='store_order_custome_700a25_idx',
+        ),
+    ]
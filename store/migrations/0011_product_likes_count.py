@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    Product = apps.get_model('store', 'Product')
+    product_type = ContentType.objects.filter(app_label='store', model='product').first()
+    if product_type is None:
+        return
+    likes = LikedItem.objects \
+        .filter(content_type=product_type, object_id=OuterRef('pk')) \
+        .order_by() \
+        .values('object_id') \
+        .annotate(count=Count('pk')) \
+        .values('count')
+    Product.objects.update(likes_count=Coalesce(Subquery(likes), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0003_likeditem_unique'),
+        ('store', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_exhausted_events(apps, schema_editor):
+    OrderEvent = apps.get_model('store', 'OrderEvent')
+    OrderEvent.objects \
+        .filter(attempts__gte=settings.STORE_ORDER_EVENT_MAX_ATTEMPTS) \
+        .update(failed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_exhausted_events, migrations.RunPython.noop),
+    ]
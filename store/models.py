@@ -1,9 +1,15 @@
+from django.apps import apps
 from django.conf import settings
 from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from uuid import uuid4
 
+from . import cache
 from .validators import validate_file_size
 
 
@@ -12,10 +18,31 @@ class Promotion(models.Model):
     discount = models.FloatField()
 
 
+class CollectionQuerySet(models.QuerySet):
+    def adjust_products_count(self, deltas):
+        for collection_id, delta in deltas.items():
+            if collection_id is not None and delta:
+                self.filter(pk=collection_id).update(products_count=F('products_count') + delta)
+    
+    def recount_products(self):
+        products = Product.objects \
+            .filter(collection_id=OuterRef('pk')) \
+            .order_by() \
+            .values('collection_id') \
+            .annotate(count=Count('pk')) \
+            .values('count')
+        return self.update(products_count=Coalesce(Subquery(products), Value(0)))
+
+
 class Collection(models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         'Product', on_delete=models.SET_NULL, null=True, related_name='+')
+    # Maintained by the Product signal receivers and ProductQuerySet,
+    # repaired by the recount_collections command.
+    products_count = models.IntegerField(default=0, editable=False)
+    
+    objects = CollectionQuerySet.as_manager()
     
     def __str__(self) -> str:
         return self.title
@@ -24,6 +51,92 @@ class Collection(models.Model):
         ordering = ['title']
 
 
+class ProductQuerySet(models.QuerySet):
+    """
+    Bulk writes skip the post_save/post_delete receivers, so they keep
+    Collection.products_count and the catalog cache in step themselves.
+    """
+    
+    def bulk_create(self, objs, *args, scopes=None, **kwargs):
+        """
+        Bumps `scopes` afterwards, or ('products',) when the caller does not
+        know which rows changed.
+        """
+        with transaction.atomic(using=self.db):
+            conflicts = len(args) > 1 or kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+            if conflicts:
+                # Upserted rows may move out of the collections they are in now.
+                objs = list(objs)
+                collection_ids = set(self.filter(pk__in=[obj.pk for obj in objs if obj.pk is not None])
+                                     .order_by().values_list('collection_id', flat=True).distinct())
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if conflicts:
+                # Some rows may have been updated or skipped instead of inserted.
+                collection_ids |= {obj.collection_id for obj in objs}
+                Collection.objects.filter(pk__in=collection_ids).recount_products()
+            else:
+                deltas = {}
+                for obj in objs:
+                    deltas[obj.collection_id] = deltas.get(obj.collection_id, 0) + 1
+                Collection.objects.adjust_products_count(deltas)
+        cache.bump_on_commit(*(scopes if scopes is not None else [('products',)]))
+        return objs
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'collection' in fields or 'collection_id' in fields:
+            with transaction.atomic(using=self.db):
+                collection_ids = set(self.filter(pk__in=[obj.pk for obj in objs])
+                                     .order_by().values_list('collection_id', flat=True).distinct())
+                count = super().bulk_update(objs, fields, *args, **kwargs)
+                collection_ids |= {obj.collection_id for obj in objs}
+                Collection.objects.filter(pk__in=collection_ids).recount_products()
+        else:
+            count = super().bulk_update(objs, fields, *args, **kwargs)
+        cache.bump_on_commit(('products',))
+        return count
+    
+    def update(self, **kwargs):
+        # Neither is shown by a cached response that must change at once.
+        if set(kwargs) <= {'search_vector', 'likes_count'}:
+            return super().update(**kwargs)
+        if 'collection' in kwargs or 'collection_id' in kwargs:
+            with transaction.atomic(using=self.db):
+                collection_ids = set(self.order_by().values_list('collection_id', flat=True).distinct())
+                count = super().update(**kwargs)
+                target = kwargs.get('collection_id', kwargs.get('collection'))
+                collection_ids.add(getattr(target, 'pk', target))
+                Collection.objects.filter(pk__in=collection_ids).recount_products()
+        else:
+            count = super().update(**kwargs)
+        cache.bump_on_commit(('products',))
+        return count
+    
+    def adjust_likes_count(self, deltas):
+        """
+        Adds {product_id: delta} to likes_count with one UPDATE. Only the
+        changed products' details are invalidated; cached lists show the new
+        counts once they expire.
+        """
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        change = Case(*[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+                      output_field=models.IntegerField())
+        count = self.filter(pk__in=deltas).update(likes_count=F('likes_count') + change)
+        cache.bump_on_commit(*[('product', product_id) for product_id in deltas])
+        return count
+    
+    def recount_likes(self):
+        LikedItem = apps.get_model('likes', 'LikedItem')
+        likes = LikedItem.objects \
+            .filter(content_type=ContentType.objects.get_for_model(Product), object_id=OuterRef('pk')) \
+            .order_by() \
+            .values('object_id') \
+            .annotate(count=Count('pk')) \
+            .values('count')
+        return self.update(likes_count=Coalesce(Subquery(likes), Value(0)))
+
+
 class Product(models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField()
@@ -33,12 +146,40 @@ class Product(models.Model):
     last_update = models.DateTimeField(auto_now=True)
     collection = models.ForeignKey(Collection, on_delete=models.PROTECT, related_name='products')
     promotions = models.ManyToManyField(Promotion, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Written in batches by store.tasks.flush_likes from the buffered counts
+    # in store.counters, repaired by the recount_likes command.
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    objects = ProductQuerySet.as_manager()
     
     def __str__(self) -> str:
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that signal handlers can tell when a product moves
+        # to another collection.
+        instance._loaded_collection_id = instance.__dict__.get('collection_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Atomic so the products_count update made by the post_save
+        # receiver commits or rolls back together with the row.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_collection_id = self.collection_id
+    
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title']),
+            models.Index(fields=['collection', 'title']),
+            models.Index(fields=['collection', 'unit_price']),
+            models.Index(fields=['unit_price']),
+            models.Index(fields=['last_update']),
+        ]
         
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -79,6 +220,19 @@ class Customer(models.Model):
         ]
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        Loads the items of every order in one extra query, with only the
+        product columns OrderItemSerializer shows.
+        """
+        items = OrderItem.objects \
+            .select_related('product') \
+            .only('order', 'quantity', 'unit_price', 'product__title', 'product__unit_price') \
+            .order_by('pk')
+        return self.prefetch_related(models.Prefetch('items', queryset=items))
+
+
 class Order(models.Model):
     PAYMENT_STATUS_PENDING = 'P'
     PAYMENT_STATUS_COMPLETE = 'C'
@@ -93,11 +247,24 @@ class Order(models.Model):
     payment_status = models.CharField(
         max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PENDING)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
+    # Written once at checkout; item_count is the number of units.
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    objects = OrderQuerySet.as_manager()
     
     class Meta:
         permissions = [
             ('cancel_order', 'Can cancel order')
         ]
+        indexes = [
+            # Serves customer order lists and the keyset-paginated history,
+            # and on PostgreSQL answers the history totals from the index.
+            models.Index(fields=['customer', '-placed_at', '-id'], include=['total_amount'],
+                         name='store_order_history_idx'),
+            # Lets the sales rollup walk orders placed after its watermark.
+            models.Index(fields=['placed_at', 'id'], name='store_order_placed_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -107,6 +274,59 @@ class OrderItem(models.Model):
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
 
 
+class OrderEvent(models.Model):
+    """
+    An order event waiting to be sent to its receivers. It is written in the
+    order's transaction and deleted once every receiver has handled it, or
+    marked failed after STORE_ORDER_EVENT_MAX_ATTEMPTS attempts.
+    """
+    CREATED = 'created'
+    NAME_CHOICES = [
+        (CREATED, 'Created'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    name = models.CharField(max_length=20, choices=NAME_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+
+class ProductDailySales(models.Model):
+    """Units, revenue and orders of a product per day, kept by store.analytics."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='store_productdailysales_day_product'),
+        ]
+
+
+class CollectionDailySales(models.Model):
+    """Units, revenue and orders of a collection per day, kept by store.analytics."""
+    day = models.DateField()
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'collection'], name='store_collectiondailysales_day_collection'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """The last order (by placed_at, id) a rollup has counted."""
+    name = models.CharField(max_length=50, primary_key=True)
+    placed_at = models.DateTimeField(null=True)
+    order_id = models.PositiveIntegerField(default=0)
+
+
 class Address(models.Model):
     street = models.CharField(max_length=255)
     city = models.CharField(max_length=255)
@@ -118,6 +338,12 @@ class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Lets the abandoned cart sweeper find the oldest carts first.
+            models.Index(fields=['created_at']),
+        ]
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -133,4 +359,14 @@ class Review(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
-    date = models.DateField(auto_now_add=True)
\ No newline at end of file
+    date = models.DateField(auto_now_add=True)
+
+
+class IdempotencyKey(models.Model):
+    """The stored response of a request sent with an Idempotency-Key header."""
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    content_type = models.CharField(max_length=255)
+    content = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
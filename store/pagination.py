@@ -1,4 +1,159 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seeks past the last row of the previous page instead of using OFFSET.
+
+    The queryset ordering (from OrderingFilter, the model Meta or the search
+    rank) is extended with `pk` so that ties are broken the same way on
+    every page. The total count is only computed when `?count=true`.
+    """
+    page_size = 20
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.ordering = self.get_ordering(queryset)
+        self.count = queryset.count() if self.include_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+        ordering = [(name, descending != reverse) for name, descending in self.ordering]
+        queryset = queryset.order_by(*[('-' if descending else '') + name for name, descending in ordering])
+        if cursor is not None:
+            queryset = queryset.filter(self.seek(queryset.model, ordering, cursor['position']))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or []
+        fields = []
+        for field in ordering:
+            if not isinstance(field, str) or field == '?':
+                continue
+            fields.append((field.lstrip('-'), field.startswith('-')))
+        if not any(name in ('pk', queryset.model._meta.pk.name) for name, _ in fields):
+            fields.append(('pk', False))
+        return fields
+
+    def seek(self, model, ordering, position):
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(ordering, position):
+            value = self.to_python(model, name, value)
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        position = []
+        for name, _ in self.ordering:
+            value = attrgetter(name.replace('__', '.'))(instance)
+            position.append(value if isinstance(value, (int, float, str)) else str(value))
+        cursor = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # encode_cursor() only writes scalars; annotations are not validated by
+        # to_python(), so anything else would reach the query.
+        if any(isinstance(value, bool) or not isinstance(value, (int, float, str)) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return {'position': position, 'reverse': reverse}
+
+
+class OptInKeysetPagination(KeysetPagination):
+    """
+    Leaves the listing unpaginated unless the client sends `?cursor=`
+    (empty for the first page), so existing clients keep getting a list.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
 
 class DefaultPagination(PageNumberPagination):
-    page_size = 20
\ No newline at end of file
+    page_size = 20
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from .importers import ChunkedRowImporter
+from .models import Customer
+
+
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name']
+CUSTOMER_FIELDS = ['phone', 'birth_date', 'membership']
+
+
+class UserRowSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField()
+    password = serializers.CharField(required=False)
+    first_name = serializers.CharField(max_length=150, required=False)
+    last_name = serializers.CharField(max_length=150, required=False)
+    phone = serializers.CharField(max_length=255, required=False)
+    birth_date = serializers.DateField(required=False)
+    membership = serializers.ChoiceField(choices=Customer.MEMBERSHIP_CHOICES, required=False)
+
+
+class UserProvisioner(ChunkedRowImporter):
+    """
+    Creates users and their customers chunk by chunk with two bulk INSERTs,
+    instead of a save() and a post_save INSERT per user. Both INSERTs share
+    a transaction, so no user is left without a customer. Passwords are
+    hashed in `workers` processes; with 0 workers they are hashed inline.
+    Users whose username or email is taken are reported, not updated.
+    """
+
+    row_serializer = UserRowSerializer
+    counters = ('created',)
+
+    def __init__(self, chunk_size=1000, workers=None):
+        super().__init__(chunk_size)
+        self.workers = workers
+
+    def run(self, rows):
+        if self.workers == 0:
+            self.hash_passwords = partial(map, make_password)
+            return super().run(rows)
+        # django.setup() lets the workers hash when they are spawned rather than forked.
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as pool:
+            self.hash_passwords = partial(pool.map, make_password, chunksize=100)
+            return super().run(rows)
+
+    def import_rows(self, valid):
+        User = get_user_model()
+        usernames = {data['username'] for _, data in valid}
+        emails = {data['email'] for _, data in valid}
+        taken = set()
+        for username, email in User.objects \
+                .filter(Q(username__in=usernames) | Q(email__in=emails)) \
+                .values_list('username', 'email'):
+            taken.update([('username', username), ('email', email)])
+
+        accepted = []
+        for line, data in valid:
+            duplicates = [name for name in ['username', 'email'] if (name, data[name]) in taken]
+            if duplicates:
+                self.add_error(line, {name: ['Already exists.'] for name in duplicates})
+                continue
+            # Later rows of the file may not reuse a username or email either.
+            taken.update([('username', data['username']), ('email', data['email'])])
+            accepted.append(data)
+        if not accepted:
+            return
+
+        passwords = self.hash_passwords([data.get('password') for data in accepted])
+        users = [User(password=password, **{name: data[name] for name in USER_FIELDS if name in data})
+                 for data, password in zip(accepted, passwords)]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            Customer.objects.bulk_create([
+                Customer(user=user, **{name: data[name] for name in CUSTOMER_FIELDS if name in data})
+                for user, data in zip(users, accepted)])
+        self.result['created'] += len(users)
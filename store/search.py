@@ -0,0 +1,156 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Product
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+PRODUCT_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config='english')
+    + SearchVector('description', weight='B', config='english')
+)
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PostgresSearchBackend:
+    """
+    Full-text search over the stored `Product.search_vector` (GIN indexed),
+    with a trigram match on the title so typos still find something. The
+    match uses pg_trgm's `%` operator, which the trigram index serves, so
+    its threshold is the pg_trgm.similarity_threshold setting (0.3).
+
+    Both scores are real (float4) in PostgreSQL. They are cast to double
+    precision, which Python's float holds exactly, so a keyset cursor can
+    compare a page's last score for equality and ties are not repeated.
+    """
+    config = 'english'
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, search_type='websearch', config=self.config)
+        return queryset \
+            .annotate(search_rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+                      similarity=Cast(TrigramSimilarity('title', query), FloatField())) \
+            .filter(Q(search_vector=search_query) | Q(title__trigram_similar=query)) \
+            .order_by('-search_rank', '-similarity', 'pk')
+
+    def update(self, product_ids):
+        Product.objects.filter(pk__in=product_ids).update(search_vector=PRODUCT_SEARCH_VECTOR)
+
+    def remove(self, product_ids):
+        # The vector lives on the row itself, so deleting the row is enough.
+        pass
+
+    def rebuild(self):
+        return Product.objects.update(search_vector=PRODUCT_SEARCH_VECTOR)
+
+
+class InvertedIndexSearchBackend:
+    """
+    In-process token -> {product_id: weight} index for databases without
+    full-text search (SQLite in tests and local runs). Every term in the
+    query has to match; products are ranked by the summed term weights.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._documents = {}
+
+    def search(self, queryset, query):
+        scores = self._score(tokenize(query))
+        if not scores:
+            return queryset.none()
+        ranking = Case(
+            *[When(pk=pk, then=Value(float(score))) for pk, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField())
+        return queryset \
+            .filter(pk__in=scores.keys()) \
+            .annotate(search_rank=ranking) \
+            .order_by('-search_rank', 'pk')
+
+    def update(self, product_ids):
+        rows = Product.objects.filter(pk__in=product_ids).values_list('pk', 'title', 'description')
+        with self._lock:
+            if self._postings is None:
+                return
+            for pk in product_ids:
+                self._discard(pk)
+            for pk, title, description in rows:
+                self._add(pk, title, description)
+
+    def remove(self, product_ids):
+        with self._lock:
+            if self._postings is None:
+                return
+            for pk in product_ids:
+                self._discard(pk)
+
+    def rebuild(self):
+        rows = Product.objects.values_list('pk', 'title', 'description').iterator(chunk_size=2000)
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            count = 0
+            for pk, title, description in rows:
+                self._add(pk, title, description)
+                count += 1
+        return count
+
+    def _score(self, tokens):
+        if not tokens:
+            return {}
+        if self._postings is None:
+            self.rebuild()
+        with self._lock:
+            postings = [self._postings.get(token, {}) for token in set(tokens)]
+        postings.sort(key=len)
+        scores = dict(postings[0])
+        for posting in postings[1:]:
+            scores = {pk: score + posting[pk] for pk, score in scores.items() if pk in posting}
+        return scores
+
+    def _add(self, pk, title, description):
+        weights = defaultdict(int)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][pk] = weight
+        self._documents[pk] = list(weights)
+
+    def _discard(self, pk):
+        for token in self._documents.pop(pk, []):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(pk, None)
+                if not posting:
+                    del self._postings[token]
+
+
+_backends = {}
+
+
+def get_search_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'postgresql':
+            _backends[vendor] = PostgresSearchBackend()
+        else:
+            _backends[vendor] = InvertedIndexSearchBackend()
+    return _backends[vendor]
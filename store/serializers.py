@@ -1,15 +1,19 @@
 from decimal import Decimal
+from functools import partial
 from django.db import transaction
 from rest_framework import serializers
 
-from .signals import order_created
+from .carts import ADD, REMOVE, SET, cart_changed, get_cart_store
+from .compiled import CompiledListSerializer
+from .inventory import atomic_with_retries, reserve
+from . import events
+from .tagging import load_tags
 from store.models import Product, Collection, Review, Cart, CartItem, Customer, Order, OrderItem, ProductImage
 
 class CollectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Collection
         fields = ['id', 'title', 'products_count']
-    products_count = serializers.IntegerField(read_only=True) # annotated column coming in this
 
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,17 +26,25 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField(method_name='get_tags')
     
     class Meta:
         model = Product
         fields = ['id', 'title', 'description', 'slug', 'inventory', 'unit_price', 
-                  'price_with_tax', 'collection', 'images']
+                  'price_with_tax', 'collection', 'images', 'tags', 'likes_count']
+        list_serializer_class = CompiledListSerializer
 
     price_with_tax = serializers.SerializerMethodField(method_name='calculate_tax')
     
     def calculate_tax(self, product: Product):
         return product.unit_price * Decimal(1.1)
     
+    def get_tags(self, product: Product):
+        # ProductViewSet loads the tag_labels of a whole page in one query.
+        if not hasattr(product, 'tag_labels'):
+            load_tags([product])
+        return product.tag_labels
+    
     def validate(self, attrs):
         # Just showing how to override with an example
         # if attrs['password'] != attrs['confirm_password']:
@@ -61,11 +73,16 @@ class CartItemSerializer(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField(method_name='get_total_price')
 
     def get_total_price(self, cart_item: CartItem):
-        return cart_item.quantity * cart_item.product.unit_price
+        # DatabaseCartStore annotates the line total.
+        total_price = getattr(cart_item, 'total_price', None)
+        if total_price is None:
+            total_price = cart_item.quantity * cart_item.product.unit_price
+        return total_price
 
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'quantity', 'total_price']
+        list_serializer_class = CompiledListSerializer
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -77,8 +94,10 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'items', 'total_price']
         
-    def get_total_price(self, instance: Cart):
-        return sum([item.quantity * item.product.unit_price for item in instance.items.all()])
+    def get_total_price(self, instance):
+        if instance.total_price is not None:
+            return instance.total_price
+        return sum([item.quantity * item.product.unit_price for item in instance.items])
     
     
 class AddCartItemSerializer(serializers.ModelSerializer):
@@ -88,24 +107,17 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['id', 'product_id', 'quantity']
         
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('No product with the given ID was found')
-        return value
-    
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
-         
-        try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
         
+        # The store checks the product as part of the write.
+        try:
+            self.instance = get_cart_store().add_item(cart_id, product_id, quantity)
+        except Product.DoesNotExist:
+            raise serializers.ValidationError({'product_id': ['No product with the given ID was found']})
+        cart_changed(cart_id)
         return self.instance
     
     
@@ -114,6 +126,42 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['quantity']
         
+    def save(self, **kwargs):
+        store = get_cart_store()
+        cart_id = self.context['cart_id']
+        item_id = self.context['item_id']
+        if 'quantity' in self.validated_data:
+            self.instance = store.update_item(cart_id, item_id, self.validated_data['quantity'])
+            cart_changed(cart_id)
+        else:
+            self.instance = store.get_item(cart_id, item_id)
+        return self.instance
+        
+        
+class CartItemChangeListSerializer(serializers.ListSerializer):
+    def validate(self, changes):
+        product_ids = {change['product_id'] for change in changes}
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                {'product_id': [f'No product with the given ID was found: {product_id}' for product_id in missing]})
+        return changes
+        
+        
+class CartItemChangeSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=[ADD, SET, REMOVE], default=ADD)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, required=False)
+    
+    class Meta:
+        list_serializer_class = CartItemChangeListSerializer
+        
+    def validate(self, data):
+        if data['op'] != REMOVE and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': ['This field is required.']})
+        return data
+        
         
 class CustomerSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(read_only=True)
@@ -129,6 +177,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'quantity', 'unit_price']
+        list_serializer_class = CompiledListSerializer
     # def get_total_price(self, orderitem):
     #     return orderitem.quantity * ( orderitem.unit_price)
 
@@ -137,7 +186,7 @@ class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'placed_at', 'payment_status', 'items']
+        fields = ['id', 'customer', 'placed_at', 'payment_status', 'total_amount', 'item_count', 'items']
         
         
 class CreateOrderSerializer(serializers.ModelSerializer):
@@ -148,34 +197,49 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         fields = ['cart_id']
         
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
+        try:
+            cart = get_cart_store().get_cart(cart_id)
+        except Cart.DoesNotExist:
             raise serializers.ValidationError('No cart with the given ID was found.')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
+        if not cart.items:
             raise serializers.ValidationError('The cart is empty.')
         return cart_id
 
     def save(self, **kwargs):
-        with transaction.atomic():
-            customer = Customer.objects.get(user_id=self.context['user_id'])
-            order = Order.objects.create(customer=customer)
-            items = CartItem.objects \
-                            .select_related('product') \
-                            .filter(cart_id=self.validated_data['cart_id'])
-            order_items = []
-            for item in items:
-                order_items.append(
-                    OrderItem(
-                        order = order,
-                        product = item.product,
-                        unit_price = item.product.unit_price,
-                        quantity = item.quantity
-                    ))   
-            OrderItem.objects.bulk_create(order_items)
-            Cart.objects.filter(pk=self.validated_data['cart_id']).delete()
-            
-            order_created.send_robust(sender=self.__class__, order=order)
-            
-            return order
+        store = get_cart_store()
+        # Carts kept outside the database are written to it before checkout.
+        store.flush(self.validated_data['cart_id'])
+        return atomic_with_retries(partial(self.place_order, store, self.validated_data['cart_id']))
+        
+    def place_order(self, store, cart_id):
+        customer_id = self.context.get('customer_id') or \
+            Customer.objects.only('id').get(user_id=self.context['user_id']).id
+        items = list(CartItem.objects \
+                        .select_related('product') \
+                        .filter(cart_id=cart_id))
+        order = Order.objects.create(
+            customer_id=customer_id,
+            total_amount=sum(item.quantity * item.product.unit_price for item in items),
+            item_count=sum(item.quantity for item in items))
+        order_items = []
+        for item in items:
+            order_items.append(
+                OrderItem(
+                    order = order,
+                    product = item.product,
+                    unit_price = item.product.unit_price,
+                    quantity = item.quantity
+                ))   
+        OrderItem.objects.bulk_create(order_items)
+        store.delete(cart_id)
+        transaction.on_commit(partial(cart_changed, cart_id))
+        
+        # Stock is taken last, so the product rows stay locked only until commit.
+        reserve({item.product_id: item.quantity for item in order_items})
+        
+        events.order_created(order)
+        
+        return order
         
 class UpdateOrderSerializer(serializers.ModelSerializer):
     class Meta:
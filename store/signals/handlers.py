@@ -1,12 +1,95 @@
+from django.apps import apps
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from store.models import Customer
+from store import cache
+from store.identity import forget_identity
+from store.models import Collection, Customer, Product, ProductImage, Promotion
+from store.search import get_search_backend
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
         Customer.objects.create(user=kwargs['instance'])
-        
-    
\ No newline at end of file
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def forget_user_identity(sender, **kwargs):
+    forget_identity(kwargs['instance'].pk)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def forget_customer_identity(sender, **kwargs):
+    forget_identity(kwargs['instance'].user_id)
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, **kwargs):
+    get_search_backend().update([kwargs['instance'].pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, **kwargs):
+    get_search_backend().remove([kwargs['instance'].pk])
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, **kwargs):
+    product = kwargs['instance']
+    previous_collection_id = getattr(product, '_loaded_collection_id', None)
+    if kwargs['created']:
+        Collection.objects.adjust_products_count({product.collection_id: 1})
+    elif previous_collection_id is not None and previous_collection_id != product.collection_id:
+        Collection.objects.adjust_products_count({previous_collection_id: -1, product.collection_id: 1})
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, **kwargs):
+    Collection.objects.adjust_products_count({kwargs['instance'].collection_id: -1})
+
+
+@receiver(post_save, sender=Product)
+def invalidate_saved_product(sender, **kwargs):
+    product = kwargs['instance']
+    previous_collection_id = getattr(product, '_loaded_collection_id', None)
+    scopes = cache.product_scopes(product.pk, {product.collection_id, previous_collection_id})
+    if kwargs['created'] or previous_collection_id != product.collection_id:
+        # products_count of the collection(s) changed
+        scopes.append(('collections',))
+    cache.bump_on_commit(*scopes)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product(sender, **kwargs):
+    product = kwargs['instance']
+    cache.bump_on_commit(*cache.product_scopes(product.pk, [product.collection_id]), ('collections',))
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_image(sender, **kwargs):
+    product_id = kwargs['instance'].product_id
+    collection_id = Product.objects.filter(pk=product_id).values_list('collection_id', flat=True).first()
+    cache.bump_on_commit(*cache.product_scopes(product_id, [collection_id]))
+
+
+@receiver([post_save, post_delete], sender=Collection)
+def invalidate_collection(sender, **kwargs):
+    cache.bump_on_commit(('collection', kwargs['instance'].pk), ('collections',))
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_promotion(sender, **kwargs):
+    cache.bump_on_commit(('promotions',))
+
+
+def invalidate_tags(sender, **kwargs):
+    # Product responses list their tags and can be filtered by them.
+    cache.bump_on_commit(('tags',))
+
+
+# The tags app is optional; its models are named, not imported.
+if apps.is_installed('tags'):
+    for model in ['tags.Tag', 'tags.TaggedItem']:
+        post_save.connect(invalidate_tags, sender=model)
+        post_delete.connect(invalidate_tags, sender=model)
@@ -0,0 +1,42 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Exists, OuterRef, Value
+
+from .models import Product
+
+
+def tagged_products():
+    """
+    The tags app's TaggedItems of products, or None when the app is not
+    installed. Its models come from the app registry, so store does not
+    import the generic tags app and runs without it.
+    """
+    if not apps.is_installed('tags'):
+        return None
+    TaggedItem = apps.get_model('tags', 'TaggedItem')
+    # get_for_model() caches the content type, so it is looked up once per process.
+    return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Product))
+
+
+def tagged(label):
+    """
+    An EXISTS condition matching products that carry a tag with `label`,
+    answered from the (tag, content_type, object_id) index. Without the
+    tags app it matches nothing.
+    """
+    items = tagged_products()
+    if items is None:
+        return Value(False)
+    return Exists(items.filter(object_id=OuterRef('pk'), tag__label=label))
+
+
+def load_tags(products):
+    """Sets `tag_labels` on every product from one query and returns them."""
+    labels = {product.pk: [] for product in products}
+    items = tagged_products()
+    if items is not None and labels:
+        for object_id, label in items.filter(object_id__in=labels).order_by('pk').values_list('object_id', 'tag__label'):
+            labels[object_id].append(label)
+    for product in products:
+        product.tag_labels = labels[product.pk]
+    return products
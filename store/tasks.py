@@ -0,0 +1,151 @@
+import logging
+import time
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import analytics, cache
+from .carts import get_cart_store
+from .counters import get_like_counter
+from .events import SCHEDULED_KEY
+from .models import Cart, IdempotencyKey, OrderEvent
+from .signals import order_created
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderEventsFailed(Exception):
+    pass
+
+
+@shared_task
+def flush_carts():
+    """Writes carts changed since their last flush to the database."""
+    store = get_cart_store()
+    flushed = 0
+    while True:
+        count = store.flush_dirty(settings.STORE_CART_FLUSH_BATCH_SIZE)
+        flushed += count
+        if count < settings.STORE_CART_FLUSH_BATCH_SIZE:
+            return flushed
+
+
+@shared_task
+def sweep_abandoned_carts(max_age=None, batch_size=None, pause=None, max_batches=None):
+    """
+    Deletes carts older than `max_age` seconds, oldest first, in batches of
+    `batch_size` primary keys with a `pause` between batches so locks and
+    WAL writes stay short. Stops after `max_batches`; the next run goes on.
+    """
+    max_age = settings.STORE_CART_MAX_AGE if max_age is None else max_age
+    batch_size = batch_size or settings.STORE_CART_SWEEP_BATCH_SIZE
+    pause = settings.STORE_CART_SWEEP_PAUSE if pause is None else pause
+    max_batches = max_batches or settings.STORE_CART_SWEEP_MAX_BATCHES
+
+    started = time.monotonic()
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    stats = {'carts': 0, 'items': 0, 'batches': 0}
+    while stats['batches'] < max_batches:
+        cart_ids = list(Cart.objects.filter(created_at__lt=cutoff)
+                        .order_by('created_at')
+                        .values_list('pk', flat=True)[:batch_size])
+        if not cart_ids:
+            break
+        _, deleted = Cart.objects.filter(pk__in=cart_ids).delete()
+        stats['carts'] += deleted.get('store.Cart', 0)
+        stats['items'] += deleted.get('store.CartItem', 0)
+        stats['batches'] += 1
+        if settings.STORE_CART_SNAPSHOTS:
+            cache.bump(*[('cart', str(cart_id)) for cart_id in cart_ids])
+        if len(cart_ids) < batch_size:
+            break
+        time.sleep(pause)
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    logger.info('Swept abandoned carts: %(carts)d carts and %(items)d items in %(batches)d batches (%(seconds)ss)',
+                stats)
+    return stats
+
+
+@shared_task(bind=True, autoretry_for=(OrderEventsFailed,), retry_backoff=True, retry_jitter=True,
+             max_retries=settings.STORE_ORDER_EVENT_MAX_ATTEMPTS)
+def dispatch_order_events(self):
+    """
+    Sends pending order events to the order_created receivers, in batches.
+    Events whose receivers all succeeded are deleted; the rest are retried
+    with backoff, so receivers may see an order more than once. An event is
+    tried at most once per run, and after STORE_ORDER_EVENT_MAX_ATTEMPTS it
+    is marked failed and left for an operator.
+    """
+    # From here on, a newly committed event queues another dispatch.
+    default_cache.delete(SCHEDULED_KEY)
+    batch_size = settings.STORE_ORDER_EVENT_BATCH_SIZE
+    max_attempts = settings.STORE_ORDER_EVENT_MAX_ATTEMPTS
+    sent = failed = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            events = list(OrderEvent.objects
+                          .select_for_update(skip_locked=True, of=('self',))
+                          .select_related('order')
+                          .filter(pk__gt=last_pk, failed_at=None)
+                          .order_by('pk')[:batch_size])
+            done = []
+            retry = []
+            for event in events:
+                # A savepoint per event keeps a receiver's failed query from
+                # breaking the batch's transaction.
+                with transaction.atomic():
+                    responses = order_created.send_robust(sender=OrderEvent, order=event.order)
+                errors = [error for _, error in responses if isinstance(error, Exception)]
+                for error in errors:
+                    logger.error('order_created receiver failed for order %s: %r', event.order_id, error)
+                (retry if errors else done).append(event)
+            dead = [event.pk for event in retry if event.attempts + 1 >= max_attempts]
+            OrderEvent.objects.filter(pk__in=[event.pk for event in done]).delete()
+            OrderEvent.objects.filter(pk__in=[event.pk for event in retry]).update(attempts=F('attempts') + 1)
+            OrderEvent.objects.filter(pk__in=dead).update(failed_at=timezone.now())
+        for event in retry:
+            if event.pk in dead:
+                logger.error('Giving up on order event %s for order %s after %d attempts',
+                             event.pk, event.order_id, max_attempts)
+        sent += len(done)
+        failed += len(retry) - len(dead)
+        if len(events) < batch_size:
+            break
+        last_pk = events[-1].pk
+    if failed:
+        raise OrderEventsFailed(f'{failed} order events failed')
+    return sent
+
+
+@shared_task
+def roll_up_sales():
+    """Adds orders placed since the last run to the daily sales rollups."""
+    return analytics.roll_up_sales(max_chunks=settings.STORE_SALES_ROLLUP_MAX_CHUNKS)
+
+
+@shared_task
+def prune_idempotency_keys():
+    """Deletes stored responses that can no longer be replayed."""
+    cutoff = timezone.now() - timedelta(seconds=settings.STORE_IDEMPOTENCY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+@shared_task
+def flush_likes():
+    """Adds the buffered like counts to Product.likes_count."""
+    counter = get_like_counter()
+    flushed = 0
+    while True:
+        count = counter.flush(settings.STORE_LIKE_FLUSH_BATCH_SIZE)
+        flushed += count
+        if count < settings.STORE_LIKE_FLUSH_BATCH_SIZE:
+            return flushed
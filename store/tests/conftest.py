@@ -10,4 +10,36 @@ def authenticate(api_client):
     from django.contrib.auth.models import User
     def do_authenticate(is_staff=False):
         return api_client.force_authenticate(user=User(is_staff=is_staff))
-    return do_authenticate
\ No newline at end of file
+    return do_authenticate
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_celery(settings):
+    # Tasks run inline, so tests never need a broker or a worker. Celery
+    # reads the Django settings on every lookup.
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+
+
+@pytest.fixture
+def create_customer(db):
+    from django.conf import settings
+    from model_bakery import baker
+    def do_create_customer(**kwargs):
+        # The customer row is created by the post_save receiver on the user.
+        return baker.make(settings.AUTH_USER_MODEL, **kwargs).customer
+    return do_create_customer
+
+
+@pytest.fixture(params=['store.carts.DatabaseCartStore', 'store.carts.InMemoryCartStore'])
+def cart_store(request, settings):
+    from store.carts import get_cart_store
+    settings.STORE_CART_BACKEND = request.param
+    store = get_cart_store()
+    if hasattr(store, 'clear'):
+        store.clear()
+    return store
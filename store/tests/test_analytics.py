@@ -0,0 +1,134 @@
+import io
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import pytest
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from model_bakery import baker
+
+from store import analytics
+from store.models import (Collection, CollectionDailySales, Order, OrderItem, Product, ProductDailySales,
+                          RollupWatermark)
+
+
+@pytest.fixture
+def place_order(create_customer):
+    def do_place_order(day, *items):
+        order = baker.make(Order, customer=create_customer())
+        placed_at = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(hours=12)
+        Order.objects.filter(pk=order.pk).update(placed_at=placed_at)
+        for product, quantity in items:
+            baker.make(OrderItem, order=order, product=product, quantity=quantity, unit_price=product.unit_price)
+        return order
+    return do_place_order
+
+
+@pytest.fixture
+def products(db):
+    collections = baker.make(Collection, _quantity=2)
+    return [baker.make(Product, collection=collections[0], unit_price=2),
+            baker.make(Product, collection=collections[0], unit_price=5),
+            baker.make(Product, collection=collections[1], unit_price=1)]
+
+
+def sales(model, key):
+    return {(row['day'], row[key]): (row['units'], row['revenue'], row['order_count'])
+            for row in model.objects.values('day', key, 'units', 'revenue', 'order_count')}
+
+
+@pytest.mark.django_db
+class TestRollUpSales:
+    def test_counts_units_revenue_and_orders_per_day(self, place_order, products):
+        first, second, third = products
+        place_order(date(2026, 1, 1), (first, 2), (second, 1))
+        place_order(date(2026, 1, 1), (first, 1), (third, 4))
+        place_order(date(2026, 1, 2), (second, 3))
+
+        assert analytics.roll_up_sales(chunk_size=2) == 3
+
+        assert sales(ProductDailySales, 'product_id') == {
+            (date(2026, 1, 1), first.id): (3, 6, 2),
+            (date(2026, 1, 1), second.id): (1, 5, 1),
+            (date(2026, 1, 1), third.id): (4, 4, 1),
+            (date(2026, 1, 2), second.id): (3, 15, 1),
+        }
+        # Both products of the first order are in one collection, one order.
+        assert sales(CollectionDailySales, 'collection_id') == {
+            (date(2026, 1, 1), first.collection_id): (4, 11, 2),
+            (date(2026, 1, 1), third.collection_id): (4, 4, 1),
+            (date(2026, 1, 2), second.collection_id): (3, 15, 1),
+        }
+
+    def test_only_counts_orders_after_the_watermark(self, place_order, products):
+        first = products[0]
+        place_order(date(2026, 1, 1), (first, 1))
+        analytics.roll_up_sales()
+        last = place_order(date(2026, 1, 1), (first, 2))
+
+        assert analytics.roll_up_sales() == 1
+        assert analytics.roll_up_sales() == 0
+
+        assert sales(ProductDailySales, 'product_id') == {(date(2026, 1, 1), first.id): (3, 6, 2)}
+        assert RollupWatermark.objects.get(name=analytics.WATERMARK).order_id == last.id
+
+    def test_leaves_recent_orders_for_the_next_run(self, place_order, products):
+        order = place_order(date(2026, 1, 1), (products[0], 1))
+        Order.objects.filter(pk=order.pk).update(placed_at=timezone.now())
+
+        assert analytics.roll_up_sales() == 0
+
+    def test_backfill_rebuilds_the_rollups(self, place_order, products):
+        place_order(date(2026, 1, 1), (products[0], 1))
+        place_order(date(2026, 1, 2), (products[0], 1))
+        analytics.roll_up_sales()
+        ProductDailySales.objects.update(units=100)
+
+        call_command('backfill_sales', '--rebuild', '--chunk-size', '1', stdout=io.StringIO())
+
+        assert set(ProductDailySales.objects.values_list('units', flat=True)) == {1}
+
+
+@pytest.mark.django_db
+class TestAnalyticsEndpoints:
+    def test_if_user_is_not_admin_returns_403(self, api_client, authenticate):
+        authenticate()
+
+        response = api_client.get('/store/analytics/products/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_collection_sales_are_filtered_by_range_and_collection(self, api_client, place_order, products):
+        first, _, third = products
+        place_order(date(2026, 1, 1), (first, 1), (third, 1))
+        place_order(date(2026, 1, 5), (first, 1))
+        analytics.roll_up_sales()
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/analytics/collections/',
+                                  {'start': '2026-01-01', 'end': '2026-01-03', 'collection': first.collection_id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(row['day'], row['collection_id'], row['units']) for row in response.data] == \
+            [(date(2026, 1, 1), first.collection_id, 1)]
+
+    def test_top_products_are_ordered_by_revenue(self, api_client, place_order, products):
+        first, second, third = products
+        place_order(date(2026, 1, 1), (first, 1), (second, 1), (third, 10))
+        place_order(date(2026, 1, 2), (first, 1))
+        analytics.roll_up_sales()
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/analytics/products/',
+                                  {'start': '2026-01-01', 'end': '2026-01-07', 'limit': 2})
+
+        assert [(row['product_id'], row['revenue']) for row in response.data] == [(third.id, 10), (second.id, 5)]
+
+    def test_if_range_is_reversed_returns_400(self, api_client):
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/analytics/products/', {'start': '2026-01-02', 'end': '2026-01-01'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
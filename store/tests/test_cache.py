@@ -0,0 +1,129 @@
+import pytest
+
+from django.contrib.auth.models import User
+from rest_framework import status
+from model_bakery import baker
+
+from store import cache
+from store.cache import get_stats
+from store.models import Collection, Product, ProductImage
+
+
+@pytest.mark.django_db
+class TestCachedProductList:
+    def test_if_listing_is_repeated_second_request_is_a_hit(self, api_client, django_assert_num_queries):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=3)
+        url = f'/store/products/?collection_id={collection.id}'
+
+        first = api_client.get(url)
+        with django_assert_num_queries(0):
+            second = api_client.get(url)
+
+        assert second.data == first.data
+        assert get_stats(['products'])['products'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+    def test_if_query_params_are_reordered_same_entry_is_used(self, api_client):
+        collection = baker.make(Collection)
+
+        api_client.get(f'/store/products/?collection_id={collection.id}&ordering=unit_price')
+        api_client.get(f'/store/products/?ordering=unit_price&collection_id={collection.id}')
+
+        assert get_stats(['products'])['products']['hits'] == 1
+
+    def test_if_product_is_updated_its_collection_listing_is_refreshed(self, api_client, django_capture_on_commit_callbacks):
+        collection = baker.make(Collection)
+        product = baker.make(Product, collection=collection, title='Old')
+        url = f'/store/products/?collection_id={collection.id}'
+        api_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.title = 'New'
+            product.save()
+        response = api_client.get(url)
+
+        assert response.data['results'][0]['title'] == 'New'
+
+    def test_if_other_collection_changes_listing_stays_cached(self, api_client):
+        collection, other = baker.make(Collection, _quantity=2)
+        baker.make(Product, collection=collection)
+        url = f'/store/products/?collection_id={collection.id}'
+        api_client.get(url)
+
+        baker.make(Product, collection=other)
+        api_client.get(url)
+
+        assert get_stats(['products'])['products']['hits'] == 1
+
+    def test_if_product_moves_both_collections_are_refreshed(self, api_client, django_capture_on_commit_callbacks):
+        source, target = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=source)
+        api_client.get(f'/store/products/?collection_id={source.id}')
+        api_client.get(f'/store/products/?collection_id={target.id}')
+
+        product = Product.objects.get(pk=product.id)
+        with django_capture_on_commit_callbacks(execute=True):
+            product.collection = target
+            product.save()
+        old = api_client.get(f'/store/products/?collection_id={source.id}')
+        new = api_client.get(f'/store/products/?collection_id={target.id}')
+
+        assert old.data['results'] == []
+        assert [p['id'] for p in new.data['results']] == [product.id]
+
+    def test_if_image_is_deleted_product_detail_is_refreshed(self, api_client, django_capture_on_commit_callbacks):
+        product = baker.make(Product)
+        image = baker.make(ProductImage, product=product, image='store/images/a.png')
+        assert len(api_client.get(f'/store/products/{product.id}/').data['images']) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            image.delete()
+        response = api_client.get(f'/store/products/{product.id}/')
+
+        assert response.data['images'] == []
+
+
+    def test_versions_are_bumped_only_after_commit(self, django_capture_on_commit_callbacks):
+        collection = baker.make(Collection)
+        versions = cache.get_versions([('catalog',)])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=collection)
+            assert cache.get_versions([('catalog',)]) == versions
+
+        assert cache.get_versions([('catalog',)]) != versions
+
+
+@pytest.mark.django_db
+class TestCachedCollections:
+    def test_if_product_is_added_products_count_is_refreshed(self, api_client, django_capture_on_commit_callbacks):
+        collection = baker.make(Collection)
+        api_client.get('/store/collections/')
+        api_client.get(f'/store/collections/{collection.id}/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=collection)
+        listing = api_client.get('/store/collections/')
+        detail = api_client.get(f'/store/collections/{collection.id}/')
+
+        assert listing.data[0]['products_count'] == 1
+        assert detail.data['products_count'] == 1
+
+
+@pytest.mark.django_db
+class TestCacheStats:
+    def test_if_user_is_not_admin_returns_403(self, api_client, authenticate):
+        authenticate(is_staff=False)
+
+        response = api_client.get('/store/cache-stats/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_user_is_admin_returns_counters(self, api_client):
+        api_client.get('/store/collections/')
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/cache-stats/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['collections']['misses'] == 1
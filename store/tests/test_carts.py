@@ -0,0 +1,264 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from rest_framework import status
+from model_bakery import baker
+
+from store.carts import get_cart_store
+from store.models import Cart, CartItem, Order, Product
+from store.tasks import flush_carts
+
+
+@pytest.fixture
+def create_cart(api_client):
+    def do_create_cart():
+        return api_client.post('/store/carts/').data['id']
+    return do_create_cart
+
+
+@pytest.fixture
+def add_item(api_client):
+    def do_add_item(cart_id, product_id, quantity=1):
+        return api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product_id, 'quantity': quantity})
+    return do_add_item
+
+
+@pytest.mark.django_db
+class TestCarts:
+    def test_if_cart_is_created_returns_empty_cart(self, api_client, cart_store):
+        response = api_client.post('/store/carts/')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['items'] == []
+        assert response.data['total_price'] == 0
+
+    def test_if_same_product_is_added_twice_quantities_add_up(self, api_client, cart_store, create_cart, add_item):
+        product = baker.make(Product, unit_price=2)
+        cart_id = create_cart()
+
+        add_item(cart_id, product.id, 2)
+        response = add_item(cart_id, product.id, 3)
+        cart = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['quantity'] == 5
+        assert len(cart.data['items']) == 1
+        assert cart.data['items'][0]['product']['id'] == product.id
+        assert cart.data['total_price'] == 10
+
+    def test_if_product_does_not_exist_returns_400(self, cart_store, create_cart, add_item):
+        response = add_item(create_cart(), 0)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'product_id' in response.data
+
+    def test_if_item_is_added_it_takes_one_query(self, cart_store, create_cart, add_item,
+                                                 django_assert_max_num_queries):
+        product = baker.make(Product)
+        cart_id = create_cart()
+
+        with django_assert_max_num_queries(1):
+            add_item(cart_id, product.id)
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client, cart_store, add_item):
+        product = baker.make(Product)
+
+        assert api_client.get('/store/carts/not-a-uuid/').status_code == status.HTTP_404_NOT_FOUND
+        response = add_item('5f0c6a5e-6d1b-4f0e-9f55-000000000000', product.id)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.data['detail'] == 'Cart not found.'
+
+    def test_if_item_is_updated_and_removed(self, api_client, cart_store, create_cart, add_item):
+        product = baker.make(Product)
+        cart_id = create_cart()
+        item_id = add_item(cart_id, product.id).data['id']
+
+        response = api_client.patch(f'/store/carts/{cart_id}/items/{item_id}/', {'quantity': 4})
+        assert response.data == {'quantity': 4}
+        assert api_client.get(f'/store/carts/{cart_id}/items/{item_id}/').data['quantity'] == 4
+
+        response = api_client.delete(f'/store/carts/{cart_id}/items/{item_id}/')
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert api_client.get(f'/store/carts/{cart_id}/items/').data == []
+
+    def test_if_cart_is_deleted_returns_404_afterwards(self, api_client, cart_store, create_cart):
+        cart_id = create_cart()
+
+        response = api_client.delete(f'/store/carts/{cart_id}/')
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert api_client.get(f'/store/carts/{cart_id}/').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_cart_is_checked_out_order_has_its_items(self, api_client, cart_store, create_cart, add_item,
+                                                         create_customer):
+        customer = create_customer()
+        product = baker.make(Product, unit_price=3, inventory=10)
+        cart_id = create_cart()
+        add_item(cart_id, product.id, 2)
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.post('/store/orders/', {'cart_id': cart_id})
+
+        assert response.status_code == status.HTTP_200_OK
+        order = Order.objects.get(pk=response.data['id'])
+        assert [(item.product_id, item.quantity) for item in order.items.all()] == [(product.id, 2)]
+        assert not Cart.objects.filter(pk=cart_id).exists()
+        assert api_client.get(f'/store/carts/{cart_id}/').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+# The vendor is known at import; whether the test database is in memory is
+# not, since pytest-django only switches to it once the tests run.
+@pytest.mark.skipif(connection.vendor == 'sqlite',
+                    reason='SQLite fails concurrent write transactions instead of queueing them')
+class TestConcurrentCartItemAdds:
+    def test_if_same_product_is_added_concurrently_quantities_add_up(self, cart_store):
+        product = baker.make(Product)
+        cart_id = cart_store.create().id
+
+        def add(_):
+            try:
+                return cart_store.add_item(cart_id, product.id, 1).quantity
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            quantities = list(executor.map(add, range(40)))
+
+        assert sorted(quantities) == list(range(1, 41))
+        assert [item.quantity for item in cart_store.get_cart(cart_id).items] == [40]
+
+
+@pytest.mark.django_db
+class TestWriteBehindCartStore:
+    @pytest.fixture
+    def store(self, settings):
+        settings.STORE_CART_BACKEND = 'store.carts.InMemoryCartStore'
+        store = get_cart_store()
+        store.clear()
+        return store
+
+    def test_cart_is_written_to_the_database_only_when_flushed(self, store):
+        product = baker.make(Product)
+        cart_id = store.create().id
+        store.add_item(cart_id, product.id, 2)
+
+        assert not Cart.objects.filter(pk=cart_id).exists()
+        assert flush_carts() == 1
+        assert list(CartItem.objects.filter(cart_id=cart_id).values_list('product_id', 'quantity')) == \
+            [(product.id, 2)]
+        assert flush_carts() == 0
+
+    def test_flush_replaces_removed_items(self, store):
+        first, second = baker.make(Product, _quantity=2)
+        cart_id = store.create().id
+        store.add_item(cart_id, first.id, 1)
+        store.add_item(cart_id, second.id, 1)
+        flush_carts()
+
+        store.remove_item(cart_id, first.id)
+        flush_carts()
+
+        assert list(CartItem.objects.filter(cart_id=cart_id).values_list('product_id', flat=True)) == [second.id]
+
+    def test_if_cart_is_only_in_the_database_it_is_read_back(self, store):
+        product = baker.make(Product)
+        cart_id = store.create().id
+        store.add_item(cart_id, product.id, 2)
+        flush_carts()
+        store.clear()
+
+        store.add_item(cart_id, product.id, 1)
+
+        assert [(item.id, item.quantity) for item in store.get_cart(cart_id).items] == [(product.id, 3)]
+
+    def test_if_cart_is_unknown_raises_does_not_exist(self, store):
+        with pytest.raises(Cart.DoesNotExist):
+            store.get_cart('5f0c6a5e-6d1b-4f0e-9f55-000000000000')
+
+
+@pytest.mark.django_db
+class TestBulkCartItems:
+    def test_if_changes_are_valid_returns_resulting_cart(self, api_client, cart_store, create_cart, add_item):
+        kept, removed, added = baker.make(Product, unit_price=1, _quantity=3)
+        cart_id = create_cart()
+        add_item(cart_id, kept.id, 1)
+        add_item(cart_id, removed.id, 1)
+
+        response = api_client.post(f'/store/carts/{cart_id}/items/bulk/', [
+            {'product_id': kept.id, 'quantity': 2},
+            {'product_id': removed.id, 'op': 'remove'},
+            {'product_id': added.id, 'quantity': 4, 'op': 'set'},
+            {'product_id': added.id, 'quantity': 1},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        quantities = {item['product']['id']: item['quantity'] for item in response.data['items']}
+        assert quantities == {kept.id: 3, added.id: 5}
+        assert response.data['total_price'] == 8
+
+    def test_if_a_product_does_not_exist_nothing_is_applied(self, api_client, cart_store, create_cart):
+        product = baker.make(Product)
+        cart_id = create_cart()
+
+        response = api_client.post(f'/store/carts/{cart_id}/items/bulk/', [
+            {'product_id': product.id, 'quantity': 1},
+            {'product_id': 0, 'quantity': 1},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(f'/store/carts/{cart_id}/items/').data == []
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client, cart_store):
+        product = baker.make(Product)
+
+        response = api_client.post('/store/carts/5f0c6a5e-6d1b-4f0e-9f55-000000000000/items/bulk/',
+                                   [{'product_id': product.id, 'quantity': 1}], format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_query_count_does_not_grow_with_the_batch(self, api_client, cart_store, create_cart,
+                                                      django_assert_max_num_queries):
+        products = baker.make(Product, _quantity=30)
+        cart_id = create_cart()
+
+        with django_assert_max_num_queries(8):
+            response = api_client.post(f'/store/carts/{cart_id}/items/bulk/', [
+                {'product_id': product.id, 'quantity': 1, 'op': 'set' if i % 2 else 'add'}
+                for i, product in enumerate(products)
+            ], format='json')
+
+        assert len(response.data['items']) == 30
+
+
+@pytest.mark.django_db
+class TestCartTotals:
+    def test_totals_are_computed_in_one_query(self, api_client, create_cart, add_item,
+                                              django_assert_num_queries):
+        cart_id = create_cart()
+        for unit_price, quantity in [(2, 3), ('1.25', 4)]:
+            add_item(cart_id, baker.make(Product, unit_price=unit_price).id, quantity)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert [item['total_price'] for item in response.data['items']] == [6, 5]
+        assert response.data['total_price'] == 11
+
+    def test_if_snapshots_are_on_cart_is_served_from_cache_until_it_changes(
+            self, api_client, settings, create_cart, add_item, django_assert_num_queries):
+        settings.STORE_CART_SNAPSHOTS = True
+        product = baker.make(Product, unit_price=2)
+        cart_id = create_cart()
+        add_item(cart_id, product.id)
+        api_client.get(f'/store/carts/{cart_id}/')
+
+        with django_assert_num_queries(0):
+            cached = api_client.get(f'/store/carts/{cart_id}/')
+        add_item(cart_id, product.id)
+        changed = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert cached.data['total_price'] == 2
+        assert changed.data['total_price'] == 4
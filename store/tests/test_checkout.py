@@ -0,0 +1,150 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from rest_framework import status
+from model_bakery import baker
+
+from store.carts import get_cart_store
+from store.inventory import InsufficientInventory
+from store.models import Cart, Order, OrderEvent, Product
+from store.serializers import CreateOrderSerializer
+from store.signals import order_created
+from store.tasks import OrderEventsFailed, dispatch_order_events
+
+
+@pytest.fixture
+def checkout(api_client):
+    def do_checkout(customer, items):
+        store = get_cart_store()
+        cart_id = store.create().id
+        for product, quantity in items:
+            store.add_item(cart_id, product.id, quantity)
+        api_client.force_authenticate(user=customer.user)
+        return api_client.post('/store/orders/', {'cart_id': cart_id}), cart_id
+    return do_checkout
+
+
+@pytest.mark.django_db
+class TestCheckoutInventory:
+    def test_if_stock_is_enough_inventory_is_decremented(self, checkout, create_customer):
+        first = baker.make(Product, inventory=5)
+        second = baker.make(Product, inventory=2)
+
+        response, _ = checkout(create_customer(), [(first, 3), (second, 2)])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Product.objects.get(pk=first.pk).inventory == 2
+        assert Product.objects.get(pk=second.pk).inventory == 0
+
+    def test_if_stock_is_short_returns_409_and_changes_nothing(self, checkout, create_customer):
+        enough = baker.make(Product, inventory=5)
+        short = baker.make(Product, inventory=1)
+
+        response, cart_id = checkout(create_customer(), [(enough, 1), (short, 2)])
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['product_ids'] == [short.id]
+        assert Product.objects.get(pk=enough.pk).inventory == 5
+        assert not Order.objects.exists()
+        assert Cart.objects.filter(pk=cart_id).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(connection.vendor == 'sqlite',
+                    reason='SQLite fails concurrent write transactions instead of queueing them')
+class TestConcurrentCheckout:
+    def test_hot_product_is_never_oversold(self, create_customer):
+        product = baker.make(Product, inventory=10)
+        customer = create_customer()
+        store = get_cart_store()
+        cart_ids = []
+        for _ in range(20):
+            cart_id = store.create().id
+            store.add_item(cart_id, product.id, 1)
+            cart_ids.append(cart_id)
+
+        def place(cart_id):
+            try:
+                serializer = CreateOrderSerializer(data={'cart_id': cart_id}, context={'user_id': customer.user_id})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return True
+            except InsufficientInventory:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            placed = list(executor.map(place, cart_ids))
+
+        assert placed.count(True) == 10
+        assert Product.objects.get(pk=product.pk).inventory == 0
+        assert Order.objects.count() == 10
+
+
+@pytest.fixture
+def receiver():
+    calls = []
+
+    def on_order_created(sender, order, **kwargs):
+        calls.append(order.id)
+
+    order_created.connect(on_order_created)
+    yield calls
+    order_created.disconnect(on_order_created)
+
+
+@pytest.mark.django_db
+class TestOrderEvents:
+    def test_receivers_run_only_after_commit(self, checkout, create_customer, receiver,
+                                             django_capture_on_commit_callbacks):
+        product = baker.make(Product, inventory=5)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response, _ = checkout(create_customer(), [(product, 1)])
+            assert receiver == []
+            assert OrderEvent.objects.count() == 1
+        for callback in callbacks:
+            callback()
+
+        assert receiver == [response.data['id']]
+        assert not OrderEvent.objects.exists()
+
+    def test_if_a_receiver_fails_event_is_kept_and_retried(self, create_customer):
+        order = baker.make(Order, customer=create_customer())
+        OrderEvent.objects.create(order=order, name=OrderEvent.CREATED)
+
+        def failing(sender, **kwargs):
+            raise ConnectionError('mail server is down')
+
+        order_created.connect(failing)
+        try:
+            dispatch_order_events.apply()
+        finally:
+            order_created.disconnect(failing)
+
+        event = OrderEvent.objects.get()
+        assert event.attempts == settings.STORE_ORDER_EVENT_MAX_ATTEMPTS
+        assert event.failed_at is not None
+
+    def test_failed_events_are_tried_once_per_run(self, create_customer, settings):
+        settings.STORE_ORDER_EVENT_BATCH_SIZE = 1
+        for _ in range(2):
+            OrderEvent.objects.create(order=baker.make(Order, customer=create_customer()), name=OrderEvent.CREATED)
+        calls = []
+
+        def failing(sender, order, **kwargs):
+            calls.append(order.id)
+            raise ConnectionError('mail server is down')
+
+        order_created.connect(failing)
+        try:
+            with pytest.raises(OrderEventsFailed):
+                dispatch_order_events()
+        finally:
+            order_created.disconnect(failing)
+
+        assert len(calls) == 2
+        assert set(OrderEvent.objects.values_list('attempts', flat=True)) == {1}
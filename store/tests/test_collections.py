@@ -1,11 +1,13 @@
 import pytest
 
+from io import StringIO
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.test import APIClient
 from model_bakery import baker
 
-from store.models import Collection
+from store.models import Collection, Product
 
 @pytest.fixture
 def create_collection(api_client):
@@ -68,4 +70,75 @@ class TestRetrieveCollection:
     
     def test_if_collection_does_not_exist_return_403(self, api_client):
         assert True
-        
\ No newline at end of file
+        
+
+@pytest.mark.django_db
+class TestCollectionProductsCount:
+    def test_if_product_is_created_count_is_incremented(self):
+        collection = baker.make(Collection)
+
+        baker.make(Product, collection=collection, _quantity=2)
+
+        collection.refresh_from_db()
+        assert collection.products_count == 2
+
+    def test_if_product_is_deleted_count_is_decremented(self):
+        collection = baker.make(Collection)
+        product = baker.make(Product, collection=collection)
+
+        product.delete()
+
+        collection.refresh_from_db()
+        assert collection.products_count == 0
+
+    def test_if_product_moves_both_counts_change(self):
+        source, target = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=source)
+
+        product = Product.objects.get(pk=product.pk)
+        product.collection = target
+        product.save()
+
+        source.refresh_from_db()
+        target.refresh_from_db()
+        assert (source.products_count, target.products_count) == (0, 1)
+
+    def test_if_products_are_bulk_created_count_is_incremented(self):
+        collection = baker.make(Collection)
+
+        Product.objects.bulk_create([
+            Product(title='a', slug='a', unit_price=1, inventory=1, collection=collection),
+            Product(title='b', slug='b', unit_price=1, inventory=1, collection=collection),
+        ])
+
+        collection.refresh_from_db()
+        assert collection.products_count == 2
+
+    def test_if_products_are_moved_with_update_counts_are_recomputed(self):
+        source, target = baker.make(Collection, _quantity=2)
+        baker.make(Product, collection=source, _quantity=3)
+
+        Product.objects.filter(collection=source).update(collection=target)
+
+        source.refresh_from_db()
+        target.refresh_from_db()
+        assert (source.products_count, target.products_count) == (0, 3)
+
+    def test_if_count_drifted_recount_command_fixes_it(self):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=2)
+        Collection.objects.filter(pk=collection.pk).update(products_count=7)
+
+        call_command('recount_collections', stdout=StringIO())
+
+        collection.refresh_from_db()
+        assert collection.products_count == 2
+
+    def test_if_collection_has_products_delete_returns_405(self, api_client):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection)
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.delete(f'/store/collections/{collection.id}/')
+
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
@@ -0,0 +1,80 @@
+import pytest
+
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from model_bakery import baker
+
+from store.compiled import compile_function, serialize_values
+from store.models import CartItem, OrderItem, Product, ProductImage
+from store.serializers import CartItemSerializer, OrderItemSerializer, ProductSerializer
+
+
+def render(serializer_class, instances, settings, compiled, **kwargs):
+    settings.STORE_COMPILED_SERIALIZERS = compiled
+    return JSONRenderer().render(serializer_class(instances, many=True, **kwargs).data)
+
+
+@pytest.mark.django_db
+class TestCompiledSerializers:
+    def test_product_output_is_byte_identical(self, settings):
+        products = baker.make(Product, unit_price=Decimal('12.34'), description=None, _quantity=3)
+        baker.make(ProductImage, product=products[0], image='store/images/a.png')
+        baker.make(ProductImage, product=products[0], image='store/images/b.png')
+        queryset = Product.objects.prefetch_related('images').all()
+        context = {'request': APIRequestFactory().get('/store/products/')}
+
+        generic = render(ProductSerializer, queryset, settings, compiled=False, context=context)
+        compiled = render(ProductSerializer, queryset, settings, compiled=True, context=context)
+
+        assert compiled == generic
+        assert b'http://testserver/media/store/images/a.png' in compiled
+
+    def test_compiled_function_is_reused_with_each_calls_context(self, settings):
+        product = baker.make(Product)
+        baker.make(ProductImage, product=product, image='store/images/a.png')
+        queryset = Product.objects.prefetch_related('images').all()
+        render(ProductSerializer, queryset, settings, compiled=True,
+               context={'request': APIRequestFactory().get('/store/products/')})
+        misses = compile_function.cache_info().misses
+
+        compiled = render(ProductSerializer, queryset, settings, compiled=True,
+                          context={'request': APIRequestFactory(SERVER_NAME='shop.test').get('/store/products/')})
+
+        assert compile_function.cache_info().misses == misses
+        assert b'http://shop.test/media/store/images/a.png' in compiled
+
+    def test_cart_item_output_is_byte_identical(self, settings):
+        baker.make(CartItem, product__unit_price=Decimal('4.50'), quantity=3, _quantity=3)
+        queryset = CartItem.objects.select_related('product').all()
+
+        generic = render(CartItemSerializer, queryset, settings, compiled=False)
+        compiled = render(CartItemSerializer, queryset, settings, compiled=True)
+
+        assert compiled == generic
+
+    def test_order_item_output_is_byte_identical(self, settings, create_customer):
+        baker.make(OrderItem, order__customer=create_customer(), unit_price=Decimal('7.10'), quantity=2, _quantity=3)
+        queryset = OrderItem.objects.select_related('product').all()
+
+        generic = render(OrderItemSerializer, queryset, settings, compiled=False)
+        compiled = render(OrderItemSerializer, queryset, settings, compiled=True)
+
+        assert compiled == generic
+
+    def test_values_rows_match_instances(self, settings, create_customer):
+        baker.make(CartItem, product__unit_price=Decimal('4.50'), quantity=3, _quantity=2)
+        baker.make(OrderItem, order__customer=create_customer(), unit_price=Decimal('7.10'), quantity=2, _quantity=2)
+        settings.STORE_COMPILED_SERIALIZERS = False
+
+        for serializer_class, model in [(CartItemSerializer, CartItem), (OrderItemSerializer, OrderItem)]:
+            queryset = model.objects.select_related('product').order_by('id')
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+            rows = serialize_values(serializer_class, queryset)
+
+            assert JSONRenderer().render(rows) == expected
+
+    def test_values_rows_are_rejected_for_nested_lists(self):
+        with pytest.raises(ValueError):
+            serialize_values(ProductSerializer, Product.objects.all())
@@ -0,0 +1,77 @@
+import pytest
+
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Collection, Product
+
+
+@pytest.mark.django_db
+class TestConditionalProductRetrieve:
+    def test_if_product_exists_returns_etag_and_last_modified(self, api_client):
+        product = baker.make(Product)
+
+        response = api_client.get(f'/store/products/{product.id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'].startswith('"')
+        assert response['Last-Modified']
+
+    def test_if_etag_matches_returns_304_without_rendering(self, api_client, django_assert_num_queries):
+        product = baker.make(Product)
+        etag = api_client.get(f'/store/products/{product.id}/')['ETag']
+
+        with django_assert_num_queries(1):
+            response = api_client.get(f'/store/products/{product.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+
+    def test_if_product_changed_etag_no_longer_matches(self, api_client):
+        product = baker.make(Product)
+        etag = api_client.get(f'/store/products/{product.id}/')['ETag']
+
+        product.inventory += 1
+        product.save()
+        response = api_client.get(f'/store/products/{product.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_if_not_modified_since_last_modified_returns_304(self, api_client):
+        product = baker.make(Product)
+        last_modified = api_client.get(f'/store/products/{product.id}/')['Last-Modified']
+
+        response = api_client.get(f'/store/products/{product.id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestConditionalListings:
+    def test_if_listing_etag_matches_returns_304(self, api_client):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection)
+        url = f'/store/products/?collection_id={collection.id}'
+        etag = api_client.get(url)['ETag']
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_if_listing_query_differs_etag_differs(self, api_client):
+        first = api_client.get('/store/products/?ordering=unit_price')
+        second = api_client.get('/store/products/?ordering=last_update')
+
+        assert first['ETag'] != second['ETag']
+
+    def test_if_collection_gains_product_etag_no_longer_matches(self, api_client, django_capture_on_commit_callbacks):
+        collection = baker.make(Collection)
+        etag = api_client.get(f'/store/collections/{collection.id}/')['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=collection)
+        response = api_client.get(f'/store/collections/{collection.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['products_count'] == 1
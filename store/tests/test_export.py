@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import pytest
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Order, OrderItem
+
+
+@pytest.fixture
+def create_orders(create_customer):
+    def do_create_orders(count, items_per_order=2, **kwargs):
+        customer = create_customer()
+        orders = baker.make(Order, customer=customer, _quantity=count, **kwargs)
+        for order in orders:
+            baker.make(OrderItem, order=order, quantity=1, unit_price=5, _quantity=items_per_order)
+        return orders
+    return do_create_orders
+
+
+def read_stream(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestOrderExport:
+    def test_if_user_is_not_admin_returns_403(self, authenticate, api_client):
+        authenticate(is_staff=False)
+
+        response = api_client.get('/store/orders/export/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_format_is_ndjson_streams_one_order_per_line(self, api_client, create_orders):
+        orders = create_orders(3)
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/orders/export/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = [json.loads(line) for line in read_stream(response).splitlines()]
+        assert [line['id'] for line in lines] == [order.id for order in orders]
+        assert len(lines[0]['items']) == 2
+        assert lines[0]['items'][0]['product_title'] == OrderItem.objects.filter(order=orders[0]) \
+            .order_by('pk').first().product.title
+
+    def test_if_format_is_csv_writes_one_row_per_item(self, api_client, create_orders):
+        create_orders(2, items_per_order=3)
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/orders/export/', {'file_format': 'csv'})
+
+        rows = list(csv.DictReader(io.StringIO(read_stream(response))))
+        assert response['Content-Type'] == 'text/csv'
+        assert len(rows) == 6
+        assert rows[0]['quantity'] == '1'
+
+    def test_if_payment_status_is_given_filters_orders(self, api_client, create_orders):
+        create_orders(2)
+        complete = create_orders(1, payment_status=Order.PAYMENT_STATUS_COMPLETE)
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/orders/export/', {'payment_status': 'C'})
+
+        lines = [json.loads(line) for line in read_stream(response).splitlines()]
+        assert [line['id'] for line in lines] == [complete[0].id]
+
+    def test_if_filter_is_invalid_returns_400(self, api_client):
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = api_client.get('/store/orders/export/', {'placed_after': 'yesterday'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_items_are_loaded_once_per_chunk(self, create_orders):
+        create_orders(10)
+        output = io.StringIO()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('export_orders', '--chunk-size=4', stdout=output)
+
+        # Three chunks of orders, one item query each.
+        assert len(queries) <= 6
+        assert len(output.getvalue().splitlines()) == 10
@@ -0,0 +1,84 @@
+import pytest
+
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Collection, Product
+from tags.models import Tag, TaggedItem
+
+
+@pytest.fixture
+def catalog(db):
+    flowers, pets = baker.make(Collection, _quantity=2)
+    products = [baker.make(Product, collection=flowers, unit_price=5),
+                baker.make(Product, collection=flowers, unit_price=30),
+                baker.make(Product, collection=pets, unit_price=30),
+                baker.make(Product, collection=pets, unit_price=150)]
+    red, sale = Tag.objects.create(label='red'), Tag.objects.create(label='sale')
+    for product, tags in zip(products, [[red, sale], [sale], [sale], []]):
+        for tag in tags:
+            TaggedItem.objects.create(tag=tag, content_object=product)
+    return flowers, pets
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+    def test_facets_are_opt_in(self, api_client, catalog):
+        response = api_client.get('/store/products/')
+
+        assert 'facets' not in response.data
+
+    def test_counts_collections_price_buckets_and_tags(self, api_client, catalog, django_assert_num_queries):
+        flowers, pets = catalog
+
+        # Count, products, images and tags of the page, then the grouped
+        # collection and price pass and the tag counts.
+        with django_assert_num_queries(6):
+            response = api_client.get('/store/products/', {'facets': 'collection,price,tag'})
+
+        facets = response.data['facets']
+        assert {row['id']: row['count'] for row in facets['collection']} == {flowers.id: 2, pets.id: 2}
+        assert [row['count'] for row in facets['price']] == [1, 0, 2, 0, 1]
+        assert (facets['price'][0]['min'], facets['price'][-1]['max']) == (None, None)
+        assert facets['tag'] == [{'label': 'sale', 'count': 3}, {'label': 'red', 'count': 1}]
+
+    def test_facets_follow_the_filters(self, api_client, catalog):
+        flowers, _ = catalog
+
+        response = api_client.get('/store/products/', {'facets': 'price,tag', 'unit_price__lt': 100,
+                                                         'tag': 'sale'})
+
+        assert [row['count'] for row in response.data['facets']['price']] == [1, 0, 2, 0, 0]
+        assert response.data['facets']['tag'][0] == {'label': 'sale', 'count': 3}
+
+    def test_facets_are_shared_across_pages_and_orderings(self, api_client, catalog, django_assert_num_queries):
+        api_client.get('/store/products/', {'facets': 'collection,price'})
+
+        # Only the page itself is read again.
+        with django_assert_num_queries(4):
+            response = api_client.get('/store/products/', {'facets': 'collection,price', 'ordering': 'unit_price'})
+
+        assert len(response.data['facets']['collection']) == 2
+
+    def test_facets_are_shared_across_cursor_pages(self, api_client, catalog, django_assert_num_queries):
+        first = api_client.get('/store/products/', {'facets': 'collection', 'cursor': ''})
+
+        # Only the count and the page are read.
+        with django_assert_num_queries(4):
+            response = api_client.get('/store/products/', {'facets': 'collection', 'cursor': '', 'count': 'true'})
+
+        assert response.data['facets'] == first.data['facets']
+
+    def test_tagging_a_product_refreshes_the_facets(self, api_client, catalog, django_capture_on_commit_callbacks):
+        api_client.get('/store/products/', {'facets': 'tag'})
+        with django_capture_on_commit_callbacks(execute=True):
+            TaggedItem.objects.create(tag=Tag.objects.get(label='red'), content_object=Product.objects.get(unit_price=150))
+
+        response = api_client.get('/store/products/', {'facets': 'tag'})
+
+        assert response.data['facets']['tag'][1] == {'label': 'red', 'count': 2}
+
+    def test_if_facet_is_unknown_returns_400(self, api_client, catalog):
+        response = api_client.get('/store/products/', {'facets': 'colour'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,122 @@
+import pytest
+
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework import status
+from model_bakery import baker
+
+from store.idempotency import lock_key, scoped_key
+from store.models import Cart, Order, Product
+
+
+KEY = '1b4e28ba-2fa1-41d2-883f-0016d3cca427'
+OTHER_KEY = '6fa459ea-ee8a-4ca4-894e-db77e160355e'
+
+
+@pytest.fixture
+def create_cart(api_client):
+    def do_create_cart(key=None):
+        headers = {} if key is None else {'HTTP_IDEMPOTENCY_KEY': key}
+        return api_client.post('/store/carts/', **headers)
+    return do_create_cart
+
+
+@pytest.fixture
+def filled_cart(api_client):
+    product = baker.make(Product, inventory=10)
+    cart_id = api_client.post('/store/carts/').data['id']
+    api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 1})
+    return cart_id
+
+
+@pytest.mark.django_db
+class TestCreateCart:
+    def test_retry_replays_the_first_response(self, create_cart):
+        first = create_cart(KEY)
+        retry = create_cart(KEY)
+
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.content == first.content
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert Cart.objects.count() == 1
+
+    def test_other_keys_create_other_carts(self, create_cart):
+        create_cart(KEY)
+        create_cart(OTHER_KEY)
+        create_cart()
+
+        assert Cart.objects.count() == 3
+
+    def test_response_is_replayed_from_the_database_after_the_cache_is_lost(self, create_cart):
+        first = create_cart(KEY)
+        cache.clear()
+
+        retry = create_cart(KEY)
+
+        assert retry.content == first.content
+        assert Cart.objects.count() == 1
+
+    def test_if_first_request_is_in_progress_returns_409(self, create_cart):
+        request = SimpleNamespace(user=AnonymousUser(), method='POST', path='/store/carts/')
+        cache.set(lock_key(scoped_key(request, KEY)), 'other', timeout=30)
+
+        response = create_cart(KEY)
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+    def test_if_key_is_too_long_returns_400(self, create_cart):
+        response = create_cart('x' * 256)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize('key', ['abc', '00000000-0000-0000-0000-000000000000'])
+    def test_if_anonymous_key_is_not_a_random_uuid_returns_400(self, create_cart, key):
+        response = create_cart(key)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Cart.objects.exists()
+
+    def test_users_may_send_any_key(self, api_client, create_cart, create_customer):
+        api_client.force_authenticate(user=create_customer().user)
+
+        first = create_cart('abc')
+        retry = create_cart('abc')
+
+        assert retry.content == first.content
+        assert Cart.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    def test_retry_replays_the_order_without_queries(self, api_client, create_customer, filled_cart,
+                                                     django_assert_num_queries):
+        api_client.force_authenticate(user=create_customer().user)
+        first = api_client.post('/store/orders/', {'cart_id': filled_cart}, HTTP_IDEMPOTENCY_KEY='abc')
+
+        with django_assert_num_queries(0):
+            retry = api_client.post('/store/orders/', {'cart_id': filled_cart}, HTTP_IDEMPOTENCY_KEY='abc')
+
+        assert first.status_code == status.HTTP_200_OK
+        assert retry.content == first.content
+        assert Order.objects.count() == 1
+
+    def test_if_key_is_reused_for_another_cart_returns_422(self, api_client, create_customer, filled_cart):
+        api_client.force_authenticate(user=create_customer().user)
+        api_client.post('/store/orders/', {'cart_id': filled_cart}, HTTP_IDEMPOTENCY_KEY='abc')
+
+        response = api_client.post('/store/orders/', {'cart_id': str(Cart.objects.create().id)},
+                                   HTTP_IDEMPOTENCY_KEY='abc')
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_keys_are_scoped_to_the_user(self, api_client, create_customer, filled_cart):
+        api_client.force_authenticate(user=create_customer().user)
+        api_client.post('/store/orders/', {'cart_id': filled_cart}, HTTP_IDEMPOTENCY_KEY='abc')
+        api_client.force_authenticate(user=create_customer().user)
+
+        response = api_client.post('/store/orders/', {'cart_id': filled_cart}, HTTP_IDEMPOTENCY_KEY='abc')
+
+        assert 'Idempotent-Replayed' not in response
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,96 @@
+import pytest
+
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from model_bakery import baker
+
+from store.identity import get_identity
+from store.models import Customer, Order, OrderItem, Product
+
+
+@pytest.fixture
+def jwt_client(api_client):
+    def do_jwt_client(user):
+        api_client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+        return api_client
+    return do_jwt_client
+
+
+@pytest.mark.django_db
+class TestIdentity:
+    def test_user_and_customer_are_read_once(self, create_customer, django_assert_num_queries):
+        customer = create_customer()
+
+        with django_assert_num_queries(1):
+            get_identity(customer.user_id)
+            identity = get_identity(customer.user_id)
+
+        assert identity.customer_id == customer.id
+        assert not identity.is_staff
+
+    def test_saving_the_user_forgets_the_identity(self, create_customer):
+        user = create_customer().user
+        get_identity(user.id)
+
+        user.is_staff = True
+        user.save()
+
+        assert get_identity(user.id).is_staff
+
+    def test_unknown_user_has_no_identity(self, db):
+        assert get_identity(0) is None
+
+
+@pytest.mark.django_db
+class TestAuthenticatedOrders:
+    def test_list_skips_the_user_and_customer_queries(self, jwt_client, create_customer,
+                                                      django_assert_num_queries):
+        customer = create_customer()
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, quantity=1, unit_price=1)
+        baker.make(Order, customer=create_customer())
+        client = jwt_client(customer.user)
+        client.get('/store/orders/')
+
+        # Orders, then their items; the identity comes from the cache.
+        with django_assert_num_queries(2):
+            response = client.get('/store/orders/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [order['id'] for order in response.data] == [order.id]
+
+    def test_checkout_uses_the_cached_customer(self, jwt_client, create_customer):
+        customer = create_customer()
+        product = baker.make(Product, inventory=10)
+        client = jwt_client(customer.user)
+        cart_id = client.post('/store/carts/').data['id']
+        client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 1})
+
+        response = client.post('/store/orders/', {'cart_id': cart_id})
+
+        assert response.data['customer'] == customer.id
+
+    def test_if_user_is_deactivated_returns_401(self, jwt_client, create_customer):
+        user = create_customer().user
+        client = jwt_client(user)
+        client.get('/store/orders/')
+
+        user.is_active = False
+        user.save()
+        response = client.get('/store/orders/')
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestMe:
+    def test_returns_the_customer_of_the_user(self, jwt_client, create_customer):
+        user = create_customer().user
+        # A customer created later no longer shares its id with the user.
+        Customer.objects.filter(user=user).delete()
+        customer = Customer.objects.create(user=user)
+
+        response = jwt_client(customer.user).get('/store/customers/me/')
+
+        assert response.data['id'] == customer.id
+        assert response.data['user_id'] == customer.user_id
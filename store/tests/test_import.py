@@ -0,0 +1,134 @@
+import pytest
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework import status
+from model_bakery import baker
+
+from store import cache
+from store.models import Collection, Product
+
+
+CSV = (
+    'slug,title,description,unit_price,inventory,collection\n'
+    'red-rose,Red Rose,,4.50,10,Flowers\n'
+    'white-lily,White Lily,Fragrant,6.00,5,Flowers\n'
+    'dog-leash,Dog Leash,,12.00,3,Pets\n'
+)
+
+
+@pytest.fixture
+def import_catalog(api_client):
+    def do_import_catalog(content, name='catalog.csv', **data):
+        upload = SimpleUploadedFile(name, content if isinstance(content, bytes) else content.encode())
+        return api_client.post('/store/catalog/import/', {'file': upload, **data}, format='multipart')
+    return do_import_catalog
+
+
+@pytest.mark.django_db
+class TestCatalogImport:
+    def test_if_user_is_not_admin_returns_403(self, authenticate, import_catalog):
+        authenticate(is_staff=False)
+
+        response = import_catalog(CSV)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_csv_is_valid_creates_products_and_collections(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = import_catalog(CSV)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 3
+        assert response.data['collections_created'] == 2
+        assert Collection.objects.get(title='Flowers').products_count == 2
+        assert Product.objects.get(slug='red-rose').unit_price == 4.5
+
+    def test_if_rows_did_not_change_nothing_is_written(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+        import_catalog(CSV)
+        last_update = Product.objects.get(slug='red-rose').last_update
+
+        response = import_catalog(CSV)
+
+        assert response.data['unchanged'] == 3
+        assert response.data['updated'] == 0
+        assert Product.objects.get(slug='red-rose').last_update == last_update
+
+    def test_if_rows_did_not_change_cache_is_kept(self, api_client, import_catalog,
+                                                  django_capture_on_commit_callbacks):
+        api_client.force_authenticate(user=User(is_staff=True))
+        import_catalog(CSV)
+        scopes = [('products',), ('catalog',), ('collections',)]
+        versions = cache.get_versions(scopes)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            import_catalog(CSV)
+
+        assert cache.get_versions(scopes) == versions
+
+    def test_if_file_is_not_utf8_reports_a_row_error(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = import_catalog(CSV.encode('utf-16'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['invalid'] == 1
+        assert 'UTF-8' in response.data['errors'][0]['errors']
+
+    def test_if_only_inventory_is_given_updates_inventory(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+        import_catalog(CSV)
+
+        response = import_catalog('slug,inventory\nred-rose,99\nwhite-lily,5\n')
+
+        assert response.data['updated'] == 1
+        assert response.data['unchanged'] == 1
+        assert Product.objects.get(slug='red-rose').inventory == 99
+
+    def test_if_product_moves_both_collections_are_recounted(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+        import_catalog(CSV)
+
+        import_catalog('{"slug": "red-rose", "collection": "Pets"}\n', name='catalog.ndjson')
+
+        counts = dict(Collection.objects.values_list('title', 'products_count'))
+        assert counts == {'Flowers': 1, 'Pets': 2}
+
+    def test_if_ndjson_is_uploaded_products_are_upserted(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+        product = baker.make(Product, slug='red-rose', unit_price=1)
+        content = (
+            '{"slug": "red-rose", "unit_price": "2.00"}\n'
+            '{"slug": "tulip", "title": "Tulip", "unit_price": "3.00", "inventory": 1, "collection": "Flowers"}\n'
+        )
+
+        response = import_catalog(content, name='catalog.ndjson')
+
+        product.refresh_from_db()
+        assert (response.data['updated'], response.data['created']) == (1, 1)
+        assert product.unit_price == 2
+
+    def test_if_rows_are_invalid_reports_them_and_imports_the_rest(self, api_client, import_catalog):
+        api_client.force_authenticate(user=User(is_staff=True))
+        content = 'slug,title,unit_price,inventory,collection\n' \
+                  'ok,Fine,1.00,1,Flowers\n' \
+                  'bad,Bad,not-a-price,1,Flowers\n' \
+                  'new-without-title,,1.00,1,Flowers\n'
+
+        response = import_catalog(content)
+
+        assert response.data['created'] == 1
+        assert response.data['invalid'] == 2
+        assert [error['row'] for error in response.data['errors']] == [2, 3]
+
+    def test_if_chunks_are_small_all_rows_are_imported(self, api_client):
+        from store.importers import CatalogImporter
+        rows = [{'slug': f'p-{i}', 'title': f'P {i}', 'unit_price': '1.00', 'inventory': 1, 'collection': 'Bulk'}
+                for i in range(25)]
+
+        result = CatalogImporter(chunk_size=10).run(iter(rows))
+
+        assert result['created'] == 25
+        assert Collection.objects.get(title='Bulk').products_count == 25
@@ -0,0 +1,134 @@
+import io
+
+import pytest
+
+from django.core.management import call_command
+from rest_framework import status
+from model_bakery import baker
+
+from likes.models import LikedItem
+from store import cache
+from store.counters import get_like_counter
+from store.models import Product
+from store.tasks import flush_likes
+
+
+@pytest.fixture
+def like_counter(settings):
+    settings.STORE_LIKE_COUNTER_BACKEND = 'store.counters.InMemoryLikeCounter'
+    counter = get_like_counter()
+    counter.clear()
+    return counter
+
+
+@pytest.fixture
+def user(create_customer):
+    return create_customer().user
+
+
+@pytest.mark.django_db
+class TestLikeProduct:
+    def test_if_user_is_anonymous_returns_401(self, api_client):
+        product = baker.make(Product)
+
+        response = api_client.post(f'/store/products/{product.id}/like/')
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_if_product_does_not_exist_returns_404(self, api_client, user):
+        api_client.force_authenticate(user=user)
+
+        response = api_client.post('/store/products/0/like/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_likes_are_buffered_until_flushed(self, api_client, user, like_counter):
+        product = baker.make(Product)
+        api_client.force_authenticate(user=user)
+
+        first = api_client.post(f'/store/products/{product.id}/like/')
+        again = api_client.post(f'/store/products/{product.id}/like/')
+
+        assert first.status_code == status.HTTP_201_CREATED
+        assert again.status_code == status.HTTP_200_OK
+        assert again.data == {'liked': True, 'likes_count': 1}
+        product.refresh_from_db()
+        assert product.likes_count == 0
+
+        assert flush_likes() == 1
+
+        product.refresh_from_db()
+        assert product.likes_count == 1
+        assert like_counter.pending([product.id]) == {}
+
+    def test_unlike_takes_the_like_back(self, api_client, user, like_counter, create_customer):
+        product = baker.make(Product)
+        api_client.force_authenticate(user=create_customer().user)
+        api_client.post(f'/store/products/{product.id}/like/')
+        api_client.force_authenticate(user=user)
+        api_client.post(f'/store/products/{product.id}/like/')
+        flush_likes()
+
+        response = api_client.delete(f'/store/products/{product.id}/like/')
+        api_client.delete(f'/store/products/{product.id}/like/')
+        flush_likes()
+
+        assert response.data == {'liked': False, 'likes_count': 1}
+        product.refresh_from_db()
+        assert product.likes_count == 1
+
+    def test_like_only_invalidates_the_product(self, api_client, user, django_capture_on_commit_callbacks):
+        product = baker.make(Product)
+        api_client.force_authenticate(user=user)
+        versions = cache.get_versions([('products',), ('product', product.id)])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(f'/store/products/{product.id}/like/')
+
+        after = cache.get_versions([('products',), ('product', product.id)])
+        assert after[0] == versions[0]
+        assert after[1] != versions[1]
+
+    def test_database_counter_writes_immediately(self, api_client, user):
+        product = baker.make(Product)
+        api_client.force_authenticate(user=user)
+
+        api_client.post(f'/store/products/{product.id}/like/')
+
+        product.refresh_from_db()
+        assert product.likes_count == 1
+
+
+@pytest.mark.django_db
+class TestLikedProducts:
+    def test_returns_the_liked_ids_of_a_page_in_one_query(self, api_client, user, django_assert_num_queries):
+        products = baker.make(Product, _quantity=3)
+        api_client.force_authenticate(user=user)
+        for product in products[:2]:
+            api_client.post(f'/store/products/{product.id}/like/')
+
+        with django_assert_num_queries(1):
+            response = api_client.get('/store/products/liked/',
+                                      {'ids': ','.join(str(product.id) for product in products[1:])})
+
+        assert response.data == {'liked': [products[1].id]}
+
+    def test_if_ids_are_invalid_returns_400(self, api_client, user):
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get('/store/products/liked/', {'ids': '1,x'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestRecountLikes:
+    def test_fixes_drifted_counts(self, user):
+        product = baker.make(Product)
+        LikedItem.objects.create(user=user, content_object=product)
+        Product.objects.filter(pk=product.pk).update(likes_count=5)
+
+        call_command('recount_likes', stdout=io.StringIO())
+
+        product.refresh_from_db()
+        assert product.likes_count == 1
@@ -0,0 +1,95 @@
+import pytest
+
+from django.contrib.auth.models import User
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Order, OrderItem, Product
+
+
+@pytest.fixture
+def create_orders(create_customer):
+    def do_create_orders(count, customer=None):
+        orders = baker.make(Order, customer=customer or create_customer(), _quantity=count)
+        for order in orders:
+            baker.make(OrderItem, order=order, quantity=2, unit_price=3, _quantity=3)
+        return orders
+    return do_create_orders
+
+
+@pytest.mark.django_db
+class TestListOrders:
+    @pytest.mark.parametrize('count', [2, 12])
+    def test_query_count_does_not_depend_on_page_size(self, api_client, create_orders, count,
+                                                       django_assert_num_queries):
+        create_orders(count)
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        # Orders, then every item with its product.
+        with django_assert_num_queries(2):
+            response = api_client.get('/store/orders/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == count
+        assert len(response.data[0]['items']) == 3
+
+    def test_totals_are_stored_at_checkout(self, api_client, create_customer):
+        customer = create_customer()
+        first = baker.make(Product, unit_price=2, inventory=10)
+        second = baker.make(Product, unit_price='1.50', inventory=10)
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': first.id, 'quantity': 3})
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': second.id, 'quantity': 2})
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.post('/store/orders/', {'cart_id': cart_id})
+
+        assert response.data['total_amount'] == 9
+        assert response.data['item_count'] == 5
+        order = Order.objects.get(pk=response.data['id'])
+        assert (order.total_amount, order.item_count) == (9, 5)
+
+
+@pytest.mark.django_db
+class TestCustomerHistory:
+    def test_if_user_lacks_permission_returns_403(self, api_client, create_customer):
+        customer = create_customer()
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.get(f'/store/customers/{customer.id}/history/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_customer_does_not_exist_returns_404(self, api_client):
+        api_client.force_authenticate(user=User(is_staff=True, is_superuser=True))
+
+        response = api_client.get('/store/customers/0/history/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_pk_is_not_a_number_returns_404(self, api_client):
+        api_client.force_authenticate(user=User(is_staff=True, is_superuser=True))
+
+        response = api_client.get('/store/customers/abc/history/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_pages_walk_orders_newest_first_with_a_summary(self, api_client, create_customer, create_orders,
+                                                           django_assert_num_queries):
+        customer = create_customer()
+        orders = create_orders(25, customer=customer)
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(total_amount=6)
+        create_orders(2)
+        api_client.force_authenticate(user=User(is_staff=True, is_superuser=True))
+
+        # Summary, orders and their items.
+        with django_assert_num_queries(3):
+            first = api_client.get(f'/store/customers/{customer.id}/history/')
+        second = api_client.get(first.data['next'])
+
+        assert first.data['summary']['order_count'] == 25
+        assert first.data['summary']['lifetime_spend'] == 150
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        assert ids == sorted((order.id for order in orders), reverse=True)
+        assert len(first.data['results'][0]['items']) == 3
+        assert second.data['next'] is None
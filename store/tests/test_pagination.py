@@ -0,0 +1,119 @@
+import base64
+import json
+
+import pytest
+
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Collection, Product, Review
+
+
+def encode(position):
+    return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': False}).encode()).decode()
+
+
+def follow(api_client, url, params=None):
+    ids = []
+    response = api_client.get(url, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        ids += [item['id'] for item in response.data['results']]
+        if response.data['next'] is None:
+            return ids, response
+        response = api_client.get(response.data['next'])
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def test_if_cursor_is_requested_pages_cover_every_product_once(self, api_client):
+        collection = baker.make(Collection)
+        products = baker.make(Product, collection=collection, unit_price=5, _quantity=25)
+        products += baker.make(Product, collection=collection, unit_price=1, _quantity=20)
+        expected = [p.id for p in sorted(products, key=lambda p: (p.unit_price, p.id))]
+
+        ids, response = follow(api_client, '/store/products/', {'cursor': '', 'ordering': 'unit_price'})
+
+        assert ids == expected
+        assert 'count' not in response.data
+
+    def test_if_search_ranks_tie_pages_cover_every_product_once(self, api_client):
+        # Equal titles and descriptions tie on the rank and on the trigram
+        # similarity, so pages are split inside a run of equal scores.
+        products = baker.make(Product, title='Rye Bread', description='baked daily', _quantity=45)
+        baker.make(Product, title='Bread Knife', description='for rye bread', _quantity=5)
+
+        ids, _ = follow(api_client, '/store/products/', {'cursor': '', 'search': 'rye bread'})
+
+        assert len(ids) == len(set(ids)) == 50
+        assert set(ids) >= {p.id for p in products}
+
+    def test_if_descending_order_is_requested_returns_products_in_reverse(self, api_client):
+        products = baker.make(Product, _quantity=30)
+        expected = [p.id for p in sorted(products, key=lambda p: (p.last_update, p.id), reverse=True)]
+
+        ids, _ = follow(api_client, '/store/products/', {'cursor': '', 'ordering': '-last_update'})
+
+        assert ids == expected
+
+    def test_if_filter_is_applied_next_link_keeps_it(self, api_client):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=25)
+        baker.make(Product, _quantity=5)
+
+        first = api_client.get('/store/products/', {'cursor': '', 'collection_id': collection.id})
+        ids, _ = follow(api_client, '/store/products/', {'cursor': '', 'collection_id': collection.id})
+
+        assert f'collection_id={collection.id}' in first.data['next']
+        assert len(ids) == 25
+
+    def test_if_previous_link_is_followed_returns_previous_page(self, api_client):
+        baker.make(Product, _quantity=45)
+        first = api_client.get('/store/products/', {'cursor': ''})
+        second = api_client.get(first.data['next'])
+
+        previous = api_client.get(second.data['previous'])
+
+        assert first.data['previous'] is None
+        assert previous.data['results'] == first.data['results']
+
+    def test_if_count_is_requested_returns_total(self, api_client):
+        baker.make(Product, _quantity=3)
+
+        response = api_client.get('/store/products/', {'cursor': '', 'count': 'true'})
+
+        assert response.data['count'] == 3
+
+    def test_if_cursor_is_invalid_returns_404(self, api_client):
+        response = api_client.get('/store/products/', {'cursor': 'garbage'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize('position', [['not-a-price', 1], [None, None], [[1], 1], [{'a': 1}, 1]])
+    def test_if_cursor_position_is_invalid_returns_404(self, api_client, position):
+        response = api_client.get('/store/products/', {'cursor': encode(position), 'ordering': 'unit_price'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_search_cursor_position_is_invalid_returns_404(self, api_client):
+        baker.make(Product, title='Bread')
+
+        response = api_client.get('/store/products/', {'cursor': encode([None, 1]), 'search': 'bread'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_cursor_is_missing_reviews_are_not_paginated(self, api_client):
+        product = baker.make(Product)
+        baker.make(Review, product=product, _quantity=3)
+
+        response = api_client.get(f'/store/products/{product.id}/reviews/')
+
+        assert len(response.data) == 3
+
+    def test_if_cursor_is_sent_reviews_are_paginated(self, api_client):
+        product = baker.make(Product)
+        reviews = baker.make(Review, product=product, _quantity=25)
+
+        ids, _ = follow(api_client, f'/store/products/{product.id}/reviews/', {'cursor': ''})
+
+        assert ids == sorted(review.id for review in reviews)
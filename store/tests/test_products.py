@@ -6,6 +6,7 @@ from rest_framework import status
 from model_bakery import baker
 
 from store.models import Collection, Product
+from tags.models import Tag, TaggedItem
 
 
 @pytest.mark.django_db
@@ -54,4 +55,68 @@ class TestCreateProduct:
 class TestRetrieveProducts:
     
     def if_product_exists_return_200(self, api_client):
-        assert True
\ No newline at end of file
+        assert True
+
+    def test_if_pk_is_not_a_number_returns_404(self, api_client):
+        response = api_client.get('/store/products/abc/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.fixture
+def tag_product():
+    def do_tag_product(product, *labels):
+        for label in labels:
+            tag = Tag.objects.filter(label=label).first() or Tag.objects.create(label=label)
+            TaggedItem.objects.create(tag=tag, content_object=product)
+    return do_tag_product
+
+
+@pytest.mark.django_db
+class TestFilterProductsByTag:
+    def test_tag_returns_products_with_that_tag(self, api_client, tag_product):
+        red, blue, plain = baker.make(Product, _quantity=3)
+        tag_product(red, 'red', 'sale')
+        tag_product(blue, 'blue', 'sale')
+
+        response = api_client.get('/store/products/', {'tag': 'sale'})
+
+        assert {product['id'] for product in response.data['results']} == {red.id, blue.id}
+
+    def test_tags_all_requires_every_tag(self, api_client, tag_product):
+        red, blue = baker.make(Product, _quantity=2)
+        tag_product(red, 'red', 'sale')
+        tag_product(blue, 'blue', 'sale')
+
+        response = api_client.get('/store/products/', {'tags__all': 'sale,red'})
+
+        assert [product['id'] for product in response.data['results']] == [red.id]
+
+    def test_tags_of_other_models_are_ignored(self, api_client):
+        product = baker.make(Product)
+        TaggedItem.objects.create(tag=Tag.objects.create(label='red'), content_object=product.collection)
+
+        response = api_client.get('/store/products/', {'tag': 'red'})
+
+        assert response.data['results'] == []
+
+    @pytest.mark.parametrize('count', [2, 8])
+    def test_tags_are_listed_with_one_query(self, api_client, tag_product, count, django_assert_num_queries):
+        for product in baker.make(Product, _quantity=count):
+            tag_product(product, 'red', 'sale')
+
+        # Count, products, their images and their tags.
+        with django_assert_num_queries(4):
+            response = api_client.get('/store/products/')
+
+        assert response.data['results'][0]['tags'] == ['red', 'sale']
+
+    def test_tagging_a_product_refreshes_cached_listings(self, api_client, tag_product, django_capture_on_commit_callbacks):
+        product = baker.make(Product)
+        api_client.get('/store/products/', {'tag': 'red'})
+
+        with django_capture_on_commit_callbacks(execute=True):
+            tag_product(product, 'red')
+        response = api_client.get('/store/products/', {'tag': 'red'})
+
+        assert [product['id'] for product in response.data['results']] == [product.id]
@@ -0,0 +1,103 @@
+import io
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework import status
+
+from store.importers import read_rows
+from store.models import Customer
+from store.provisioning import UserProvisioner
+
+
+CSV = (
+    'username,email,password,first_name,phone,membership\n'
+    'ann,ann@example.com,s3cret-pass,Ann,555-0100,G\n'
+    'bob,bob@example.com,,Bob,,\n'
+    'cy,cy@example.com,another-pass,Cy,555-0102,S\n'
+)
+
+
+def csv_rows(count):
+    lines = ['username,email'] + [f'user{i},user{i}@example.com' for i in range(count)]
+    return read_rows(io.StringIO('\n'.join(lines) + '\n'), 'csv')
+
+
+@pytest.fixture
+def provision(api_client):
+    def do_provision(content, name='users.csv'):
+        upload = SimpleUploadedFile(name, content.encode())
+        return api_client.post('/store/customers/provision/', {'file': upload}, format='multipart')
+    return do_provision
+
+
+@pytest.mark.django_db
+class TestProvisionUsers:
+    def test_if_user_is_not_admin_returns_403(self, authenticate, provision):
+        authenticate(is_staff=False)
+
+        response = provision(CSV)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_creates_users_with_one_customer_each(self, api_client, provision):
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = provision(CSV)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 3
+        ann = get_user_model().objects.get(username='ann')
+        assert ann.check_password('s3cret-pass')
+        assert (ann.customer.phone, ann.customer.membership) == ('555-0100', 'G')
+        assert not get_user_model().objects.get(username='bob').has_usable_password()
+        assert Customer.objects.count() == 3
+
+    def test_taken_usernames_and_emails_are_reported(self, api_client, provision, create_customer):
+        create_customer(username='ann', email='someone@example.com')
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = provision(CSV + 'dee,cy@example.com\n')
+
+        assert response.data['created'] == 2
+        assert [error['row'] for error in response.data['errors']] == [1, 4]
+        assert Customer.objects.count() == 3
+
+    def test_invalid_rows_are_reported_and_the_rest_created(self, db):
+        rows = [{'username': 'ann', 'email': 'not-an-email'},
+                {'__error__': 'Expected a JSON object.'},
+                {'username': 'bob', 'email': 'bob@example.com'}]
+
+        result = UserProvisioner(chunk_size=2, workers=0).run(iter(rows))
+
+        assert {name: result[name] for name in ['rows', 'created', 'invalid']} == \
+            {'rows': 3, 'created': 1, 'invalid': 2}
+        assert [error['row'] for error in result['errors']] == [1, 2]
+
+    def test_if_file_has_too_many_rows_returns_400(self, api_client, provision, settings):
+        settings.STORE_PROVISIONING_MAX_API_ROWS = 2
+        api_client.force_authenticate(user=User(is_staff=True))
+
+        response = provision(CSV)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not get_user_model().objects.exists()
+
+    @pytest.mark.parametrize('count', [1, 20])
+    def test_query_count_does_not_depend_on_rows(self, db, count, django_assert_num_queries):
+        # Taken names, users, customers and the savepoint around them.
+        with django_assert_num_queries(5):
+            result = UserProvisioner(workers=0).run(csv_rows(count))
+
+        assert result['created'] == count
+
+    def test_command_hashes_passwords_in_worker_processes(self, tmp_path, db):
+        path = tmp_path / 'users.csv'
+        path.write_text(CSV)
+
+        call_command('provision_users', str(path), '--workers', '2', stdout=io.StringIO())
+
+        assert get_user_model().objects.get(username='cy').check_password('another-pass')
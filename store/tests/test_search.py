@@ -0,0 +1,38 @@
+import pytest
+
+from rest_framework import status
+from model_bakery import baker
+
+from store.models import Product
+
+
+@pytest.mark.django_db
+class TestSearchProducts:
+    def test_if_search_matches_title_and_description_returns_ranked_results(self, api_client):
+        in_description = baker.make(Product, title='Green Tea', description='goes well with bread')
+        in_title = baker.make(Product, title='Bread Ww Cluster', description='freshly baked')
+        baker.make(Product, title='Shampoo', description='for dry hair')
+
+        response = api_client.get('/store/products/', {'search': 'bread'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [product['id'] for product in response.data['results']] == [in_title.id, in_description.id]
+
+    def test_if_product_is_updated_search_uses_new_title(self, api_client):
+        product = baker.make(Product, title='Wood Chips', description=None)
+        product.title = 'Cedar Shavings'
+        product.save()
+
+        old = api_client.get('/store/products/', {'search': 'chips'})
+        new = api_client.get('/store/products/', {'search': 'cedar'})
+
+        assert old.data['results'] == []
+        assert [p['id'] for p in new.data['results']] == [product.id]
+
+    def test_if_search_is_combined_with_filter_returns_intersection(self, api_client):
+        product = baker.make(Product, title='Rose Bouquet', unit_price=10)
+        baker.make(Product, title='Rose Seeds', unit_price=2)
+
+        response = api_client.get('/store/products/', {'search': 'rose', 'unit_price__gt': 5})
+
+        assert [p['id'] for p in response.data['results']] == [product.id]
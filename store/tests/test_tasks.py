@@ -0,0 +1,32 @@
+import pytest
+
+from datetime import timedelta
+from django.utils import timezone
+from model_bakery import baker
+
+from store.models import Cart, CartItem
+from store.tasks import sweep_abandoned_carts
+
+
+@pytest.mark.django_db
+class TestSweepAbandonedCarts:
+    def test_only_carts_older_than_max_age_are_deleted(self):
+        old = baker.make(Cart, _quantity=5)
+        Cart.objects.filter(pk__in=[cart.pk for cart in old]).update(created_at=timezone.now() - timedelta(days=2))
+        baker.make(CartItem, cart=old[0], quantity=1)
+        recent = baker.make(Cart)
+
+        stats = sweep_abandoned_carts(max_age=24 * 60 * 60, batch_size=2, pause=0)
+
+        assert stats['carts'] == 5
+        assert stats['items'] == 1
+        assert stats['batches'] == 3
+        assert list(Cart.objects.values_list('pk', flat=True)) == [recent.pk]
+
+    def test_run_stops_after_max_batches(self):
+        baker.make(Cart, _quantity=5)
+
+        stats = sweep_abandoned_carts(max_age=0, batch_size=2, pause=0, max_batches=1)
+
+        assert stats['carts'] == 2
+        assert Cart.objects.count() == 3
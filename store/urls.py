@@ -20,5 +20,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('', include(products_router.urls)),
     path('', include(carts_router.urls)),
+    path('cache-stats/', views.CacheStatsView.as_view()),
+    path('catalog/import/', views.CatalogImportView.as_view()),
+    path('analytics/collections/', views.CollectionSalesView.as_view()),
+    path('analytics/products/', views.TopProductsView.as_view()),
     # path('products/', views.ProductList.as_view()), and more as per ur need
 ]
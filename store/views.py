@@ -1,25 +1,45 @@
-from django.db.models import Count
+from decimal import Decimal
+from functools import partial
+from itertools import islice
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, DestroyModelMixin
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+
+from likes.models import LikedItem
 
 from .models import Product, Collection, Review, Cart, CartItem
 # from .serializers import ProductSerializer, CollectionSerializer, ReviewSerializer, CartSerializer, CartItemSerializer
 from .serializers import *
 from .permissions import IsAdminOrReadOnly, ViewCustomerHistoryPermissions
 
-from .filters import ProductFilter
-from .pagination import DefaultPagination
+from . import analytics, cache
+from .carts import cart_changed, cart_scopes, get_cart_store
+from .counters import get_like_counter
+from . import exporters, facets
+from .identity import IdentityJWTAuthentication, request_identity
+from .idempotency import idempotent
+from .importers import FORMATS, CatalogImporter, guess_format, read_rows
+from .provisioning import UserProvisioner
+from .tagging import load_tags
+from .filters import ProductFilter, ProductSearchFilter
+from .pagination import DefaultPagination, KeysetPagination, OptInKeysetPagination
 
 
 class ProductViewSet(ModelViewSet):
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['title', 'description']
     ordering_fields = ['unit_price', 'last_update']
@@ -27,7 +47,11 @@ class ProductViewSet(ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     
     def get_queryset(self):
-        return Product.objects.prefetch_related('images').all()
+        return Product.objects.prefetch_related('images')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return page if page is None else load_tags(page)
     
     def get_serializer_class(self):
         return ProductSerializer
@@ -36,6 +60,35 @@ class ProductViewSet(ModelViewSet):
         context = {"request": self.request}
         return context
     
+    def list(self, request, *args, **kwargs):
+        collection_id = request.query_params.get('collection_id', '')
+        if collection_id.isdigit():
+            scopes = [('collection', int(collection_id)), ('products',), ('promotions',), ('tags',)]
+        else:
+            scopes = [('catalog',), ('products',), ('promotions',), ('tags',)]
+        return cache.cached_response(request, 'products', scopes,
+                                     partial(self.list_with_facets, request, scopes, *args, **kwargs))
+    
+    def list_with_facets(self, request, scopes, *args, **kwargs):
+        names = facets.parse_facets(request.query_params)
+        response = super().list(request, *args, **kwargs)
+        if names:
+            # Shared by every page and ordering of the same filters.
+            queryset = self.filter_queryset(self.get_queryset())
+            response.data['facets'] = cache.cached_value(
+                'product-facets', scopes + [('collections',)], facets.filter_params(request.query_params, names),
+                partial(facets.compute_facets, queryset, names))
+        return response
+    
+    def retrieve(self, request, *args, **kwargs):
+        if not kwargs['pk'].isdigit():
+            raise NotFound()
+        scopes = [('product', kwargs['pk']), ('products',), ('promotions',), ('tags',)]
+        last_update = Product.objects.filter(pk=kwargs['pk']).values_list('last_update', flat=True).first()
+        return cache.cached_response(request, 'products', scopes,
+                                     partial(super().retrieve, request, *args, **kwargs),
+                                     last_update=last_update)
+    
     def destroy(self, request, pk):
         product = self.get_object()
         if product.orderitems.count() > 0:
@@ -45,14 +98,57 @@ class ProductViewSet(ModelViewSet):
         product.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=True, methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk):
+        if not pk.isdigit() or not Product.objects.filter(pk=pk).exists():
+            raise NotFound()
+        product_id = int(pk)
+        liked = {'user_id': request.user.id, 'content_type': ContentType.objects.get_for_model(Product),
+                 'object_id': product_id}
+        if request.method == 'POST':
+            _, changed = LikedItem.objects.get_or_create(**liked)
+            delta = 1
+        else:
+            deleted, _ = LikedItem.objects.filter(**liked).delete()
+            changed = deleted > 0
+            delta = -1
+        # The row decides whether the count moves, so a repeated like or
+        # unlike leaves it alone.
+        counter = get_like_counter()
+        if changed:
+            counter.add(product_id, delta)
+        return Response({'liked': delta > 0, 'likes_count': counter.count(product_id)},
+                        status=status.HTTP_201_CREATED if changed and delta > 0 else status.HTTP_200_OK)
+    
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def liked(self, request):
+        # Which of a page of products the user has liked, in one query.
+        ids = request.query_params.get('ids', '').split(',')
+        if not all(product_id.isdigit() for product_id in ids) or len(ids) > settings.STORE_LIKED_MAX_IDS:
+            raise ValidationError({'ids': [f'Expected up to {settings.STORE_LIKED_MAX_IDS} comma-separated product ids.']})
+        liked = LikedItem.objects \
+            .filter(user_id=request.user.id, content_type=ContentType.objects.get_for_model(Product),
+                    object_id__in=ids) \
+            .order_by('object_id') \
+            .values_list('object_id', flat=True)
+        return Response({'liked': list(liked)})
+    
 
 class CollectionViewSet(ModelViewSet):
-    queryset = Collection.objects.annotate(products_count = Count('products')).all()
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     
     def get_permissions(self):
         return [IsAdminOrReadOnly()]
     
+    def list(self, request, *args, **kwargs):
+        return cache.cached_response(request, 'collections', [('collections',), ('products',)],
+                                     partial(super().list, request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        return cache.cached_response(request, 'collections', [('collection', kwargs['pk']), ('products',)],
+                                     partial(super().retrieve, request, *args, **kwargs))
+    
     def destroy(self, request, pk):
         collection = self.get_object()
         if collection.products_count > 0:
@@ -64,6 +160,7 @@ class CollectionViewSet(ModelViewSet):
     
 class ReviewViewSet(ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = OptInKeysetPagination
     
     def get_queryset(self):
         return Review.objects.filter(product_id = self.kwargs['product_pk'])
@@ -71,30 +168,79 @@ class ReviewViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {"product_id": self.kwargs['product_pk']}  
     
-class CartViewSet(CreateModelMixin, 
-                  RetrieveModelMixin, 
-                  DestroyModelMixin, 
-                  GenericViewSet):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+class CartViewSet(GenericViewSet):
     serializer_class = CartSerializer
     
+    @idempotent
+    def create(self, request):
+        cart = get_cart_store().create()
+        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
     
-class CartItemViewSet(ModelViewSet):
+    def retrieve(self, request, pk):
+        def render():
+            return Response(CartSerializer(get_cart_store().get_cart(pk)).data)
+        if not settings.STORE_CART_SNAPSHOTS:
+            return render()
+        return cache.cached_response(request, 'cart', cart_scopes(pk), render)
+    
+    def destroy(self, request, pk):
+        get_cart_store().delete(pk)
+        cart_changed(pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, Cart.DoesNotExist):
+            exc = NotFound()
+        return super().handle_exception(exc)
+    
+    
+class CartItemViewSet(GenericViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
+    max_bulk_changes = 500
     
-    def get_queryset(self):
-        # Check if the cart with the specified cart_pk exists
-        cart_pk = self.kwargs.get('cart_pk')
-        try:
-            Cart.objects.get(pk=cart_pk)
-        except Cart.DoesNotExist:
-            raise NotFound('Cart not found.')
-        return CartItem.objects.select_related('product').filter(cart_id=cart_pk)
-    
-        # Mosh code below, it is wrong, since invalid cart_id will still return [] as queryset 
-        # return CartItem.objects \
-        #         .select_related('product') \
-        #         .filter(cart_id = self.kwargs['cart_pk'])
+    # Carts are read and written through the configured cart store (see
+    # store.carts), which may keep them outside the database.
+    def list(self, request, cart_pk):
+        cart = get_cart_store().get_cart(cart_pk)
+        return Response(CartItemSerializer(cart.items, many=True).data)
+    
+    def retrieve(self, request, cart_pk, pk):
+        item = get_cart_store().get_item(cart_pk, pk)
+        return Response(CartItemSerializer(item).data)
+    
+    def create(self, request, cart_pk):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def partial_update(self, request, cart_pk, pk):
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+    
+    def destroy(self, request, cart_pk, pk):
+        get_cart_store().remove_item(cart_pk, pk)
+        cart_changed(cart_pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, cart_pk):
+        serializer = CartItemChangeSerializer(data=request.data, many=True, max_length=self.max_bulk_changes)
+        serializer.is_valid(raise_exception=True)
+        changes = [(change['op'], change['product_id'], change.get('quantity'))
+                   for change in serializer.validated_data]
+        cart = get_cart_store().apply_changes(cart_pk, changes)
+        cart_changed(cart_pk)
+        return Response(CartSerializer(cart).data)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, Cart.DoesNotExist):
+            exc = NotFound('Cart not found.')
+        elif isinstance(exc, CartItem.DoesNotExist):
+            exc = NotFound()
+        return super().handle_exception(exc)
                     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -104,16 +250,17 @@ class CartItemViewSet(ModelViewSet):
         return CartItemSerializer
     
     def get_serializer_context(self):
-        return {"cart_id": self.kwargs['cart_pk']}
+        return {"cart_id": self.kwargs['cart_pk'], "item_id": self.kwargs.get('pk')}
     
 class CustomerViewSet(ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    authentication_classes = [IdentityJWTAuthentication]
     permission_classes = [IsAdminUser]
         
     @action(detail=False, methods=['GET', 'PUT', 'PATCH'], permission_classes=[IsAuthenticated])
     def me(self, request):
-        customer = Customer.objects.get(pk=request.user.id)
+        customer = Customer.objects.get(pk=request_identity(request).customer_id)
         if request.method == 'GET':
             serializer = CustomerSerializer(customer)
             return Response(serializer.data)
@@ -130,22 +277,60 @@ class CustomerViewSet(ModelViewSet):
         
     @action(detail=True, permission_classes=[ViewCustomerHistoryPermissions])    
     def history(self, request, pk):
-        return Response('ok')
+        if not pk.isdigit():
+            raise NotFound()
+        # One grouped query both finds the customer and sums their orders.
+        summary = Customer.objects \
+            .filter(pk=pk) \
+            .order_by() \
+            .annotate(order_count=Count('order'),
+                      lifetime_spend=Coalesce(Sum('order__total_amount'), Value(Decimal(0))),
+                      last_order_at=Max('order__placed_at')) \
+            .values('order_count', 'lifetime_spend', 'last_order_at') \
+            .first()
+        if summary is None:
+            raise NotFound()
+        
+        # Walks the (customer, placed_at, id) index newest first.
+        orders = Order.objects.with_items().filter(customer_id=pk).order_by('-placed_at', '-id')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        response = paginator.get_paginated_response(OrderSerializer(page, many=True).data)
+        response.data = {'summary': summary, **response.data}
+        return response
+    
+    @action(detail=False, methods=['POST'], parser_classes=[MultiPartParser])
+    def provision(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            raise ValidationError({'file_format': [f'Expected one of {", ".join(FORMATS)}.']})
+        # Hashing blocks the request, so only small files are taken here.
+        max_rows = settings.STORE_PROVISIONING_MAX_API_ROWS
+        rows = list(islice(read_rows(upload, file_format), max_rows + 1))
+        if len(rows) > max_rows:
+            raise ValidationError({'file': [f'Expected at most {max_rows} rows; '
+                                            'use the provision_users command for larger files.']})
+        return Response(UserProvisioner(workers=0).run(rows))
             
             
 class OrderViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    pagination_class = OptInKeysetPagination
+    authentication_classes = [IdentityJWTAuthentication]
     
     def get_permissions(self):
-        if self.request.method in ['PATCH', 'DELETE']:
+        if self.request.method in ['PATCH', 'DELETE'] or self.action == 'export':
             return [IsAdminUser()]
         return [IsAuthenticated()]
     
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Order.objects.all()
-        customer_id = Customer.objects.only('id').get(user_id=self.request.user.id)
-        return Order.objects.filter(customer_id=customer_id)
+            return Order.objects.with_items()
+        customer_id = request_identity(self.request).customer_id
+        return Order.objects.with_items().filter(customer_id=customer_id)
     
     def get_serializer_class(self): 
         if self.request.method == 'POST':
@@ -154,15 +339,28 @@ class OrderViewSet(ModelViewSet):
             return UpdateOrderSerializer
         return OrderSerializer
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
             data=request.data, 
-            context = {"user_id": self.request.user.id})
+            context = {"user_id": self.request.user.id,
+                       "customer_id": request_identity(self.request).customer_id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
         serializer = OrderSerializer(order)
         return Response(serializer.data)
     
+    @action(detail=False)
+    def export(self, request):
+        filters = exporters.OrderExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        file_format = filters.validated_data['file_format']
+        response = StreamingHttpResponse(
+            exporters.export_lines(exporters.filter_orders(**filters.validated_data), file_format),
+            content_type=exporters.CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="orders.{file_format}"'
+        return response
+    
 class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
     
@@ -171,4 +369,43 @@ class ProductImageViewSet(ModelViewSet):
     
     def get_serializer_context(self):
         return {'product_id': self.kwargs['product_pk']}
-    
\ No newline at end of file
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(cache.get_stats(['products', 'collections', 'product-facets']))
+
+
+class CatalogImportView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            raise ValidationError({'file_format': [f'Expected one of {", ".join(FORMATS)}.']})
+        result = CatalogImporter().run(read_rows(upload, file_format))
+        return Response(result)
+
+
+class CollectionSalesView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        filters = analytics.SalesFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        return Response(analytics.collection_sales(**filters.validated_data))
+
+
+class TopProductsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        filters = analytics.SalesFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        return Response(analytics.top_products(**filters.validated_data))
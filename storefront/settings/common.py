@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     'django_filters',
     'corsheaders',
@@ -163,8 +164,97 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 30,
         'args': ['Hello World'],
     },
+    'flush_carts': {
+        'task': 'store.tasks.flush_carts',
+        'schedule': 60,
+    },
+    'sweep_abandoned_carts': {
+        'task': 'store.tasks.sweep_abandoned_carts',
+        'schedule': 60 * 60,
+    },
+    'dispatch_order_events': {
+        'task': 'store.tasks.dispatch_order_events',
+        'schedule': 5 * 60,
+    },
+    'roll_up_sales': {
+        'task': 'store.tasks.roll_up_sales',
+        'schedule': 5 * 60,
+    },
+    'prune_idempotency_keys': {
+        'task': 'store.tasks.prune_idempotency_keys',
+        'schedule': 60 * 60,
+    },
+    'flush_likes': {
+        'task': 'store.tasks.flush_likes',
+        'schedule': 60,
+    },
 }
 
+# Catalog responses are invalidated through version stamps (see store.cache),
+# the timeout only bounds how long unused entries occupy memory.
+STORE_CACHE_TIMEOUT = 60 * 60
+
+# Render product, cart item and order item lists through the compiled
+# row-to-dict functions in store.compiled instead of DRF's field machinery.
+STORE_COMPILED_SERIALIZERS = False
+
+# Where carts live while they are being filled (see store.carts). The
+# write-behind stores persist them at checkout and through flush_carts.
+STORE_CART_BACKEND = 'store.carts.DatabaseCartStore'
+STORE_CART_REDIS_ALIAS = 'default'
+STORE_CART_TTL = 7 * 24 * 60 * 60
+STORE_CART_FLUSH_BATCH_SIZE = 500
+
+# Carts created longer ago than this are deleted by sweep_abandoned_carts.
+STORE_CART_MAX_AGE = 30 * 24 * 60 * 60
+STORE_CART_SWEEP_BATCH_SIZE = 1000
+STORE_CART_SWEEP_PAUSE = 0.2
+STORE_CART_SWEEP_MAX_BATCHES = 500
+
+# Serve GET /store/carts/<id>/ from a cached snapshot, versioned per cart and
+# bumped on every cart change (and on catalog changes, which move prices).
+STORE_CART_SNAPSHOTS = False
+
+# order_created receivers run in store.tasks.dispatch_order_events after the
+# checkout commits; events committed within the window share one task.
+STORE_ORDER_EVENT_WINDOW = 2
+STORE_ORDER_EVENT_BATCH_SIZE = 200
+STORE_ORDER_EVENT_MAX_ATTEMPTS = 5
+
+# How long store.identity keeps a user's customer id and flags. Saving the
+# user or customer forgets the entry; the timeout covers queryset updates.
+STORE_IDENTITY_TTL = 5 * 60
+
+# roll_up_sales counts orders into the daily sales tables in chunks, leaving
+# orders younger than the lag (in seconds) for its next run.
+STORE_SALES_ROLLUP_CHUNK_SIZE = 1000
+STORE_SALES_ROLLUP_MAX_CHUNKS = 100
+STORE_SALES_ROLLUP_LAG = 60
+
+# Responses to requests sent with an Idempotency-Key are replayed for this
+# long. The lock must outlast a checkout, or a retry could run it twice.
+STORE_IDEMPOTENCY_TTL = 24 * 60 * 60
+STORE_IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Processes hashing passwords in the provision_users command; None means one
+# per CPU and 0 hashes in the calling process. The API hashes inline, so it
+# takes at most STORE_PROVISIONING_MAX_API_ROWS rows; larger files go
+# through the command.
+STORE_PROVISIONING_WORKERS = None
+STORE_PROVISIONING_MAX_API_ROWS = 100
+
+# Where product like counts are buffered before flush_likes writes them to
+# Product.likes_count (see store.counters).
+STORE_LIKE_COUNTER_BACKEND = 'store.counters.DatabaseLikeCounter'
+STORE_LIKE_REDIS_ALIAS = 'default'
+STORE_LIKE_FLUSH_BATCH_SIZE = 500
+STORE_LIKED_MAX_IDS = 100
+
+# ?facets=price counts products in buckets split at these prices, and
+# ?facets=tag returns the most used tags.
+STORE_PRICE_FACET_BOUNDARIES = [10, 25, 50, 100]
+STORE_TAG_FACET_LIMIT = 20
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False, 
@@ -18,6 +18,9 @@ DATABASES = {
 
 CELERY_BROKER_URL = 'redis://redis:6379/1'
 
+STORE_CART_BACKEND = 'store.carts.RedisCartStore'
+STORE_LIKE_COUNTER_BACKEND = 'store.counters.RedisLikeCounter'
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
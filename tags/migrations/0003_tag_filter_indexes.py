@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0002_taggeditem_content_object_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['label'], name='tags_tag_label_5f31d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['tag', 'content_type', 'object_id'], name='tags_tagged_tag_id_78e941_idx'),
+        ),
+    ]
@@ -6,6 +6,11 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 class Tag(models.Model):
     label = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['label']),
+        ]
+
     def __str__(self) -> str:
         return self.label
 
@@ -15,3 +20,10 @@ class TaggedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id']),
+            # Finds the objects carrying a tag, for filtering by tag.
+            models.Index(fields=['tag', 'content_type', 'object_id']),
+        ]